@@ -27,15 +27,46 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+import collections
+import itertools
 import time
 
 from bbs2ch import version
 from bbs2ch import http
+from bbs2ch import columns
 from bbs2ch import decode
+from bbs2ch import graph
+from bbs2ch import search
 
 DEFAULT_USERAGENT = u'Monazilla/1.00 (python-bbs2ch/%s)' % version.__VERSION__
 
 
+RANK_UNLISTED = 10000  # rank of thread not in subject.txt
+
+BoardChanges = collections.namedtuple(
+    'BoardChanges', ['new', 'removed', 'count_changed', 'rank_moved'])
+
+
+def _connection(pool):
+    """Return Connection header value."""
+    return u'keep-alive' if pool else u'close'
+
+
+def _strip_overlap(chunks):
+    """Return chunks without first newline of Range response.
+
+    returns None if the first byte is not newline.
+    """
+    for chunk in chunks:
+        if chunk:
+            break
+    else:
+        return None
+    if chunk[0] != '\n':
+        return None
+    return itertools.chain([chunk[1:]], chunks)
+
+
 class CookieBucket(object):
 
     """bbs Cookie container.
@@ -94,17 +125,23 @@ class Menu(object):
 
     """Represent a bbs2ch menu."""
 
+    board_class = None  # Board
+
     def __init__(self, url,
                  gzip=True, list_if_modified_since=None,
-                 useragent=DEFAULT_USERAGENT):
+                 useragent=DEFAULT_USERAGENT, pool=None, store=None):
         """initialize attributes."""
         # read only
         self.url = url
         self.useragent = useragent
+        self.pool = pool
+        self.store = store
         # write by user
         self.gzip = gzip
         # write by user and self
         self.list_if_modified_since = list_if_modified_since
+        # write by self
+        self.status = 0  # http status of last request
 
     def __repr__(self):
         """Return repr(self) string."""
@@ -120,9 +157,21 @@ class Menu(object):
 
         set Last-Modified value to self.list_if_modified_since
         """
+        host, request = self._request()
+        response = http.fetch(host, request, pool=self.pool)
+        start = time.time()
+        boards = list(self._boards(response))
+        if http.hooks:
+            http.emit(u'parse', {u'url': self.url, u'kind': u'menu',
+                                 u'items': len(boards),
+                                 u'seconds': time.time() - start})
+        for board in boards:
+            yield board
+
+    def _request(self):
         host, path = http.host_path(self.url)
         header = [(u'Accept-Language', u'ja'),
-                  (u'Connection', u'close'),
+                  (u'Connection', _connection(self.pool)),
                   (u'Host', host),
                   (u'Accept', u'*/*'),
                   (u'Referer', host),
@@ -131,24 +180,30 @@ class Menu(object):
             header.append((u'Accept-Encoding', u'gzip'))
         if self.list_if_modified_since:
             header.append((u'If-Modified-Since', self.list_if_modified_since))
-        request = http.encode_request(u'GET', path, header=header)
-        connection = http.send(host, request)
-        response = http.recv(connection)
-        status, res_header, res_body, length = http.decode_response(response)
+        return host, http.encode_request(u'GET', path, header=header)
+
+    def _boards(self, response):
+        status, res_header, res_body, encoding = http.decode_response_raw(
+            response)
+        self.status = status[1]
         if u'Last-Modified' in res_header:
             self.list_if_modified_since = res_header[u'Last-Modified']
 
-        for url, category, title in decode.menu(res_body):
-            yield Board(url, category, title, useragent=self.useragent)
+        for url, category, title in decode.menu_bytes(res_body, encoding):
+            yield self.board_class(url, category, title,
+                                   useragent=self.useragent,
+                                   pool=self.pool, store=self.store)
 
 
 class Board(object):
 
     """Represent bbs2ch board."""
 
+    thread_class = None  # Thread
+
     def __init__(self, url, category=u'', title=u'',
                  gzip=True, list_if_modified_since=None,
-                 useragent=DEFAULT_USERAGENT):
+                 useragent=DEFAULT_USERAGENT, pool=None, store=None):
         """initialize attributes."""
         self.url = url
         self.category = category
@@ -156,6 +211,13 @@ class Board(object):
         self.gzip = gzip
         self.list_if_modified_since = list_if_modified_since
         self.useragent = useragent
+        self.pool = pool
+        self.store = store
+        self.status = 0  # http status of last request
+        self.threads = {}  # dat: Thread
+        self.changes = BoardChanges([], [], [], [])  # of last fetch
+        self._titles = None  # search.TitleIndex, built on first access
+        self.columns = columns.BoardColumns()  # of last subject.txt
 
     def __eq__(self, other):
         """Return true if same url or same title and category."""
@@ -170,11 +232,45 @@ class Board(object):
             repr(self.title), repr(self.useragent))
 
     def __iter__(self):
-        """Return Thread list."""
+        """Return Thread list.
+
+        Thread objects of known threads are reused.
+        """
+        self.refresh()
+        return iter(self._listed())
+
+    @property
+    def titles(self):
+        """Return search.TitleIndex of listed threads.
+
+        the index is built on first access and updated by later fetches.
+        """
+        if self._titles is None:
+            self._titles = search.TitleIndex()
+            for thread in self._listed():
+                self._titles.add(thread)
+        return self._titles
+
+    def refresh(self):
+        """Fetch subject.txt and return changes from last fetch.
+
+        :rtype: BoardChanges
+        """
+        host, request = self._request()
+        response = http.fetch(host, request, pool=self.pool)
+        start = time.time()
+        changes = self._update(response)
+        if http.hooks:
+            http.emit(u'parse', {u'url': self.url, u'kind': u'subject',
+                                 u'items': len(self._listed()),
+                                 u'seconds': time.time() - start})
+        return changes
+
+    def _request(self):
         subject = self.url + u'subject.txt'
         host, path = http.host_path(subject)
         header = [(u'Accept-Language', u'ja'),
-                  (u'Connection', u'close'),
+                  (u'Connection', _connection(self.pool)),
                   (u'Host', host),
                   (u'Accept', u'*/*'),
                   (u'Referer', self.url),
@@ -183,17 +279,55 @@ class Board(object):
             header.append((u'Accept-Encoding', u'gzip'))
         if self.list_if_modified_since:
             header.append((u'If-Modified-Since', self.list_if_modified_since))
-        request = http.encode_request(u'GET', path, header=header)
-        connection = http.send(host, request)
-        response = http.recv(connection)
-        status, res_header, res_body, length = http.decode_response(response)
+        return host, http.encode_request(u'GET', path, header=header)
+
+    def _update(self, response):
+        """Update known threads by subject.txt response."""
+        status, res_header, res_body, encoding = http.decode_response_raw(
+            response)
+        self.status = status[1]
+        self.changes = BoardChanges([], [], [], [])
+        if status[1] != 200:
+            return self.changes
         if u'Last-Modified' in res_header:
             self.list_if_modified_since = res_header[u'Last-Modified']
 
-        for index, (dat, title, res) in enumerate(
-                decode.board_subject(res_body), start=1):
-            yield Thread(self.url, dat, title, index, res,
-                         useragent=self.useragent)
+        subject = list(decode.board_subject_bytes(res_body, encoding))
+        self.columns.update(subject)
+        listed = set()
+        for index, (dat, title, res) in enumerate(subject, start=1):
+            listed.add(dat)
+            thread = self.threads.get(dat)
+            if thread is None:
+                thread = self.thread_class(
+                    self.url, dat, title, index, res,
+                    useragent=self.useragent, pool=self.pool,
+                    store=self.store)
+                self.threads[dat] = thread
+                self.changes.new.append(thread)
+                continue
+            if thread.rank == RANK_UNLISTED:
+                self.changes.new.append(thread)
+            elif thread.rank != index:
+                self.changes.rank_moved.append(thread)
+            if thread.total != res:
+                self.changes.count_changed.append(thread)
+            thread.title = title
+            thread.rank = index
+            thread.total = res
+        for dat, thread in self.threads.items():
+            if dat not in listed and thread.rank != RANK_UNLISTED:
+                thread.rank = RANK_UNLISTED
+                self.changes.removed.append(thread)
+        if self._titles is not None:
+            self._titles.update(self.changes)
+        return self.changes
+
+    def _listed(self):
+        """Return listed Thread list sorted by rank."""
+        return sorted((i for i in self.threads.values()
+                       if i.rank != RANK_UNLISTED),
+                      key=lambda thread: thread.rank)
 
 
 class Thread(object):
@@ -220,12 +354,17 @@ class Thread(object):
                                self.add_param)
 
     def __init__(self, board_url, dat,
-                 title='', rank=10000, total=0,
+                 title='', rank=RANK_UNLISTED, total=0,
                  bytes=0, fetched=0,
                  gzip=True, list_if_modified_since=None,
                  cookie=None,
-                 useragent=DEFAULT_USERAGENT):
-        """initialize attributes."""
+                 useragent=DEFAULT_USERAGENT, pool=None, store=None,
+                 indexes=False):
+        """initialize attributes.
+
+        replies and columns decode every response, so they are kept
+        only if indexes is True, otherwise they are None.
+        """
         self.board_url = board_url
         self.dat = dat
         self.title = title
@@ -237,6 +376,14 @@ class Thread(object):
         self.list_if_modified_since = list_if_modified_since
         self.cookie = cookie
         self.useragent = useragent
+        self.pool = pool
+        self.store = store
+        self.status = 0  # http status of last request
+        self.replies = None  # graph.ReplyGraph of fetched responses
+        self.columns = None  # columns.ThreadColumns of fetched responses
+        if indexes:
+            self.replies = graph.ReplyGraph()
+            self.columns = columns.ThreadColumns()
 
         server_url, board_id, _empty = self.board_url.rsplit(u'/', 2)
         self.url = '%s/test/read.cgi/%s/%s/' % (server_url, board_id, dat)
@@ -256,38 +403,194 @@ class Thread(object):
             repr(self.title), repr(self.useragent)]))
 
     def __iter__(self):
-        """Return Response list."""
+        """Return Response list.
+
+        if bytes and fetched are set, only new responses are requested
+        with Range header. if the thread was aborted or replaced,
+        fetch state is reset and all responses are returned from 1.
+        if store is set, stored responses are returned before new ones
+        when the server confirms them by 206 or 304.
+        """
+        dat_file = None
+        if self.store:
+            dat_file = self.store.open(self.board_url, self.dat)
+        try:
+            state = (self.bytes, self.fetched, self.list_if_modified_since)
+            stored = []
+            if dat_file is not None:
+                stored = list(self._stored(dat_file))
+            while True:
+                host, request = self._request()
+                try:
+                    reader = http.open_response(host, request, pool=self.pool)
+                except Exception:
+                    # stored responses are returned by next iteration
+                    self.bytes, self.fetched, self.list_if_modified_since = (
+                        state)
+                    raise
+                try:
+                    chunks = self._chunks(reader)
+                    if chunks is not None:
+                        if reader.status[1] in (206, 304):
+                            for response in stored:
+                                yield response
+                        elif reader.status[1] != 200:
+                            self.bytes, self.fetched = state[:2]
+                            self.list_if_modified_since = state[2]
+                        for response in self._responses(
+                                reader, chunks, dat_file):
+                            yield response
+                finally:
+                    reader.release()
+                if chunks is not None:
+                    break
+                self._reset(dat_file)
+                stored = []
+        finally:
+            if dat_file is not None:
+                dat_file.close()
+
+    def _stored(self, dat_file):
+        """Yield stored responses after self.fetched."""
+        for num in range(self.fetched + 1, len(dat_file) + 1):
+            response = Response.from_line(num, dat_file.line(num))
+            if response:
+                self._index(response)
+                yield response
+        if self.bytes != dat_file.size:
+            self.list_if_modified_since = None
+        self.bytes = dat_file.size
+        self.fetched = len(dat_file)
+
+    def _request(self, connection=None):
+        """Return host and dat request.
+
+        :param connection: Connection header value instead of default
+        """
         board_name = http.host_path(self.board_url)[1].split('/')[1]
         dat_url = u'{}dat/{}.dat'.format(self.board_url, self.dat)
         host, path = http.host_path(dat_url)
         referer = 'http://{}/test/read.cgi{}{}/'.format(
             host, board_name, self.dat)
+        differential = bool(self.bytes and self.fetched)
 
         header = [(u'Accept-Language', u'ja'),
-                  (u'Connection', u'close'),
+                  (u'Connection', connection or _connection(self.pool)),
                   (u'Host', host),
                   (u'Accept', u'*/*'),
                   (u'Referer', referer),
                   (u'User-Agent', self.useragent)]
 
-        if self.gzip:
+        # Range is an offset of raw dat, so gzip is used only for full dat
+        if self.gzip and not differential:
             header.append((u'Accept-Encoding', u'gzip'))
         if self.list_if_modified_since:
             header.append((u'If-Modified-Since', self.list_if_modified_since))
-        if self.fetched_bytes and self.fetched_count:
-            header.append(('Range', 'bytes={}-'.format(self.fetched_bytes-1)))
+        if differential:
+            header.append((u'Range', u'bytes={}-'.format(self.bytes - 1)))
+        return host, http.encode_request(u'GET', path, header=header)
 
-        request = http.encode_request(u'GET', path, header=header)
-        connection = http.send(host, request)
-        response = http.recv(connection)
-        status, res_header, res_body, length = http.decode_response(response)
-        for index, (name, mail, date_id, message) in enumerate(
-                decode.thread_dat(res_body), start=self.fetched_count+1):
-            yield Response(index, name, mail, date_id, message)
-            self.fetched_count = index
-        self.fetched_bytes = length
-        if u'Last-Modified' in res_header:
-            self.list_if_modified_since = res_header[u'Last-Modified']
+    def _chunks(self, reader):
+        """Return dat data strings of response.
+
+        returns None if the thread was aborted or replaced.
+        """
+        status = self.status = reader.status[1]
+        if status == 206:
+            return _strip_overlap(reader.iter_content())
+        elif status == 416:
+            return None
+        elif status == 200:
+            return reader.iter_content()
+        return iter(())
+
+    def _responses(self, reader, chunks, dat_file):
+        """Yield responses from dat data strings and update fetch state."""
+        if reader.status[1] == 200:
+            self.bytes = 0
+            self.fetched = 0
+            self._clear_indexes()
+            if dat_file is not None:
+                dat_file.truncate()
+        encoding = http.content_charset(reader.header)
+        timed = bool(http.hooks)
+        seconds = 0.0
+        items = 0
+        for line in decode.iter_lines(chunks, partial=False):
+            if timed:
+                start = time.time()
+            if dat_file is not None:
+                dat_file.append(line)
+            self.bytes = self.bytes + len(line) + 1
+            self.fetched = self.fetched + 1
+            response = Response.from_line(self.fetched, line, encoding)
+            if response:
+                self._index(response)
+                if timed:
+                    seconds = seconds + time.time() - start
+                    items = items + 1
+                yield response
+        if reader.complete and u'Last-Modified' in reader.header:
+            self.list_if_modified_since = reader.header[u'Last-Modified']
+        if timed:
+            http.emit(u'parse', {u'url': self.url, u'kind': u'dat',
+                                 u'items': items, u'seconds': seconds})
+
+    def _read(self, reader, dat_file):
+        """Return new Response list of reader or None if thread is broken."""
+        chunks = self._chunks(reader)
+        if chunks is None:
+            return None
+        return list(self._responses(reader, chunks, dat_file))
+
+    def _index(self, response):
+        if self.replies is not None:
+            self.replies.add(response.num, response.anchors)
+            self.columns.add(response)
+
+    def _clear_indexes(self):
+        if self.replies is not None:
+            self.replies.clear()
+            self.columns.clear()
+
+    def _reset(self, dat_file):
+        self.bytes = 0
+        self.fetched = 0
+        self._clear_indexes()
+        self.list_if_modified_since = None
+        if dat_file is not None:
+            dat_file.truncate()
+
+    def response(self, num):
+        """Return stored Response.
+
+        :param num: response number
+        :rtype: Response
+        """
+        dat_file = self.store.open(self.board_url, self.dat)
+        try:
+            response = Response.from_line(num, dat_file.line(num))
+        finally:
+            dat_file.close()
+        if not response:
+            raise IndexError(num)
+        return response
+
+    def dump(self):
+        """Return thread attributes and fetch state dict.
+
+        Thread(**dump) returns same thread with same fetch state.
+        """
+        return {u'board_url': self.board_url,
+                u'dat': self.dat,
+                u'title': self.title,
+                u'rank': self.rank,
+                u'total': self.total,
+                u'bytes': self.bytes,
+                u'fetched': self.fetched,
+                u'gzip': self.gzip,
+                u'list_if_modified_since': self.list_if_modified_since,
+                u'useragent': self.useragent}
 
     def write(self, name, mail, message):
         """Write response."""
@@ -300,7 +603,7 @@ class Thread(object):
         bbs_url = 'http://{}{}'.format(host, bbs_path)
 
         header = [(u'Accept-Language', u'ja'),
-                  (u'Connection', u'close'),
+                  (u'Connection', _connection(self.pool)),
                   (u'Host', host),
                   ('Accept', '*/*'),
                   ('Referer', bbs_url),
@@ -326,8 +629,7 @@ class Thread(object):
 
         request = http.encode_request(
             u'POST', '/test/bbs.cgi', header, body, encoding='ms932')
-        connection = http.send(host, request)
-        response = http.recv(connection)
+        response = http.fetch(host, request, pool=self.pool)
         status, res_header, res_body, length = http.decode_response(response)
         if 'Set-Cookie' in res_header:
             self.cookie.set(host, '/test/bbs.cgi', res_header['Set-Cookie'])
@@ -343,14 +645,240 @@ class Thread(object):
                                     write_status, res_body)
 
 
+Menu.board_class = Board
+Board.thread_class = Thread
+
+
+def pipeline(threads, pool=None):
+    """Fetch threads on one host with pipelined http requests.
+
+    dat requests of all threads are sent at once on one connection.
+    threads aborted or replaced are fetched again by another request,
+    and so are the rest of a dat cut short by the server.
+    they are fetched after the pipelined connection is released,
+    results from the first of them on are kept until then.
+
+    :param threads: Thread list of the same host
+    :param pool: ConnectionPool object or None
+    :rtype: (Thread, Response list) iterator in order of threads
+    """
+    threads = list(threads)
+    if not threads:
+        return
+    dat_files = [i.store.open(i.board_url, i.dat) if i.store else None
+                 for i in threads]
+    readers = None
+    try:
+        stored = [list(thread._stored(dat_file)) if dat_file else []
+                  for thread, dat_file in zip(threads, dat_files)]
+        requests = [thread._request(u'keep-alive') for thread in threads]
+        requests[-1] = threads[-1]._request(_connection(pool))
+        hosts = set(host for host, request in requests)
+        if len(hosts) != 1:
+            raise ValueError('threads are not on one host: {}'.format(
+                ', '.join(sorted(hosts))))
+        readers = http.pipeline(
+            hosts.pop(), [request for host, request in requests], pool=pool)
+        pending = []  # (thread, responses, refetch) after first refetch
+        for index, reader in enumerate(readers):
+            thread = threads[index]
+            responses = thread._read(reader, dat_files[index])
+            # state is updated by complete lines, request the rest
+            refetch = responses is None or not reader.complete
+            if responses is None:
+                thread._reset(dat_files[index])
+                stored[index] = responses = []
+            if refetch and dat_files[index] is not None:
+                dat_files[index].close()
+                dat_files[index] = None
+            if refetch or pending:
+                pending.append((thread, stored[index] + responses, refetch))
+            else:
+                yield thread, stored[index] + responses
+        # release pipelined connection before sending other requests
+        readers.close()
+        for thread, responses, refetch in pending:
+            yield thread, responses + list(thread) if refetch else responses
+    finally:
+        if readers is not None:
+            readers.close()
+        for dat_file in dat_files:
+            if dat_file is not None:
+                dat_file.close()
+
+
+class AsyncMenu(Menu):
+
+    """bbs2ch menu fetched by http.EventLoop."""
+
+    def fetch(self, loop, callback):
+        """Request board list.
+
+        :param loop: http.EventLoop object
+        :param callback: function calls with (self, AsyncBoard list, error)
+        """
+        def done(parser, error):
+            boards = [] if error else list(self._boards(parser.read()))
+            callback(self, boards, error)
+        host, request = self._request()
+        loop.request(host, request, done)
+
+
+class AsyncBoard(Board):
+
+    """bbs2ch board fetched by http.EventLoop."""
+
+    def fetch(self, loop, callback):
+        """Request thread list.
+
+        :param loop: http.EventLoop object
+        :param callback: function calls with (self, AsyncThread list, error)
+                         changes are set to self.changes
+        """
+        def done(parser, error):
+            if not error:
+                self._update(parser.read())
+            callback(self, self._listed(), error)
+        host, request = self._request()
+        loop.request(host, request, done)
+
+
+class AsyncThread(Thread):
+
+    """bbs2ch thread fetched by http.EventLoop."""
+
+    def fetch(self, loop, callback):
+        """Request new responses.
+
+        :param loop: http.EventLoop object
+        :param callback: function calls with (self, Response list, error)
+        """
+        responses = []
+        if self.store:
+            dat_file = self.store.open(self.board_url, self.dat)
+            try:
+                responses.extend(self._stored(dat_file))
+            finally:
+                dat_file.close()
+
+        def done(parser, error):
+            if error:
+                callback(self, responses, error)
+                return
+            dat_file = None
+            if self.store:
+                dat_file = self.store.open(self.board_url, self.dat)
+            try:
+                chunks = self._chunks(parser)
+                if chunks is None:
+                    self._reset(dat_file)
+                    del responses[:]
+                    host, request = self._request()
+                    loop.request(host, request, done)
+                    return
+                responses.extend(self._responses(parser, chunks, dat_file))
+            finally:
+                if dat_file is not None:
+                    dat_file.close()
+            callback(self, responses, None)
+        host, request = self._request()
+        loop.request(host, request, done)
+
+
+AsyncMenu.board_class = AsyncBoard
+AsyncBoard.thread_class = AsyncThread
+
+
+def _field(index, slot):
+    """Return property of Response field decoded on first access."""
+    def get(self):
+        value = getattr(self, slot)
+        if value is None:
+            value = self.decode_field(index)
+            setattr(self, slot, value)
+        return value
+
+    def set(self, value):
+        setattr(self, slot, value)
+    return property(get, set)
+
+
 class Response(object):
 
-    """Represent bbs2ch response message."""
+    """Represent bbs2ch response message.
+
+    Response made by from_line() keeps raw dat line and decodes
+    fields on first access.
+    """
+
+    __slots__ = ('num', '_line', '_encoding', '_name', '_mail', '_date_id',
+                 '_message', '_anchors')
 
-    def __init__(self, num, name, mail, date_id, message):
-        """Initialize attributes."""
+    def __init__(self, num, name, mail, date_id, message, anchors=None):
+        """Initialize attributes.
+
+        anchors is >>N response number list, decoded from message if None.
+        """
         self.num = num
-        self.name = name
-        self.mail = mail
-        self.date_id = date_id
-        self.message = message
+        self._line = None
+        self._encoding = None
+        self._name = name
+        self._mail = mail
+        self._date_id = date_id
+        self._message = message
+        self._anchors = anchors
+
+    @classmethod
+    def from_line(cls, num, line, encoding='ms932'):
+        """Return Response of raw dat line, or None if line is not response.
+
+        :param num: response number
+        :param line: raw dat line string without newline
+        :param encoding: dat encoding
+        """
+        if line.count('<>') < 3:
+            return None
+        response = cls(num, None, None, None, None)
+        response._line = line
+        response._encoding = encoding
+        return response
+
+    def __getstate__(self):
+        """Return slot values for pickle."""
+        return dict((i, getattr(self, i)) for i in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore slot values from pickle."""
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    name = _field(0, '_name')
+    mail = _field(1, '_mail')
+    date_id = _field(2, '_date_id')
+    message = _field(3, '_message')
+
+    @property
+    def anchors(self):
+        """Return >>N response number list."""
+        if self._anchors is None:
+            self._anchors = tuple(decode.anchors(self.decode_field(3)))
+        return self._anchors
+
+    @anchors.setter
+    def anchors(self, value):
+        self._anchors = value
+
+    def decode_field(self, index):
+        """Return name, mail, date_id or message by index without keeping it.
+
+        :param index: 0 to 3, order of name, mail, date_id and message
+        """
+        if self._line is None:
+            return (self._name, self._mail, self._date_id,
+                    self._message)[index]
+        if self._line.count('<>') in (4, 5):
+            # '<' and '>' are never second byte of ms932 character
+            return self._line.split('<>', index + 1)[index].decode(
+                self._encoding, 'replace')
+        return decode.thread_dat_line(
+            self._line.decode(self._encoding, 'replace'))[index]
@@ -0,0 +1,192 @@
+# coding: utf8
+"""batch classification of 2ch thread responses.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import bisect
+import re
+
+AA = 1  # ascii art
+CODE = 2  # source code
+LINK_ONLY = 4  # only urls and anchors
+COPY = 8  # same message as former response
+
+RE_FEATURES = re.compile(
+    # sre tries every branch at every offset, skip plain text first
+    u'(?=[hts& 　＿´｀∀／＼｜￣ヽдω;{}])'
+    u'(?:((?:h?ttps?|sssp)://[^\\s|^<]+)'  # 1 url
+    u'|(&gt;&gt;[0-9]+(?:-[0-9]+)?)'  # 2 anchor
+    u'|( *　[ 　]*| {5,})'  # 3 full width or long spaces
+    u'|([＿´｀∀／＼｜￣ヽдω])'  # 4 ascii art symbols
+    u'|([;{}](?= ?(?:<br>|$))))',  # 5 end of code line
+    re.MULTILINE)
+RE_LINK_PARTS = re.compile(
+    u'(?:h?ttps?|sssp)://[^\\s|^<]+|&gt;&gt;[0-9]+(?:-[0-9]+)?|<br>|\\s+')
+
+
+def features(responses):
+    """Return feature count lists of messages scanned at once.
+
+    :param responses: browser.Response list
+    :rtype: dict of count lists in order of responses,
+            u'lines', u'urls', u'anchors', u'mixed_spaces', u'indents',
+            u'symbols', u'code_ends' and u'link_only' (1 if message has
+            only urls and anchors)
+    """
+    starts = []  # message start offset in joined buffer
+    messages = []
+    offset = 0
+    for response in responses:
+        message = response.message
+        starts.append(offset)
+        messages.append(message)
+        offset = offset + len(message) + 1
+    size = len(messages)
+    counts = dict((key, [0] * size) for key in (
+        u'urls', u'anchors', u'mixed_spaces', u'indents',
+        u'symbols', u'code_ends'))
+    urls, anchors, mixed, indents, symbols, code_ends = (
+        counts[u'urls'], counts[u'anchors'],
+        counts[u'mixed_spaces'], counts[u'indents'], counts[u'symbols'],
+        counts[u'code_ends'])
+    buf = u'\n'.join(messages)
+    bisect_right = bisect.bisect_right
+    for match in RE_FEATURES.finditer(buf):
+        start = match.start()
+        index = bisect_right(starts, start) - 1
+        group = match.lastindex
+        if group == 3:
+            run = match.group(3)
+            if u' ' in run and u'　' in run:
+                mixed[index] += 1
+            # dat puts a space around <br>, so indent is 1 + 4 spaces
+            if len(run) >= 5 and (start == starts[index] or
+                                  buf.startswith(u'<br>', start - 4)):
+                indents[index] += 1
+        elif group == 1:
+            urls[index] += 1
+        elif group == 2:
+            anchors[index] += 1
+        elif group == 4:
+            symbols[index] += 1
+        else:
+            code_ends[index] += 1
+    counts[u'lines'] = [m.count(u'<br>') + 1 for m in messages]
+    counts[u'link_only'] = [
+        int(bool(urls[i]) and not RE_LINK_PARTS.sub(u'', messages[i]))
+        for i in range(size)]
+    return counts
+
+
+def classify(counts, index):
+    """Return AA, CODE and LINK_ONLY flags of features() counts at index."""
+    flags = 0
+    lines = counts[u'lines'][index]
+    if (counts[u'mixed_spaces'][index] or
+            (lines >= 3 and counts[u'symbols'][index] >= 5)):
+        flags = flags | AA
+    elif (counts[u'indents'][index] + counts[u'code_ends'][index] >=
+            max(2, lines // 2)):
+        flags = flags | CODE
+    if counts[u'link_only'][index]:
+        flags = flags | LINK_ONLY
+    return flags
+
+
+class ThreadFlags(object):
+
+    """Classification flags of responses of a thread.
+
+    flags are AA, CODE, LINK_ONLY and COPY bits.
+    classified responses are cached, only new responses are classified.
+    """
+
+    def __init__(self, min_copy_length=10, seen=None):
+        """initialize attributes.
+
+        :param min_copy_length: shorter messages are not marked as COPY
+        :param seen: message hash set shared with other ThreadFlags
+                     to find copies across threads
+        """
+        self.min_copy_length = min_copy_length
+        self.nums = array.array('I')
+        self.flags = array.array('B')
+        self._seen = set() if seen is None else seen
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.classify.ThreadFlags({} responses)>'.format(
+            len(self))
+
+    def __len__(self):
+        """Return classified response count."""
+        return len(self.nums)
+
+    def add(self, responses):
+        """Classify new responses.
+
+        responses must be added in number order, added numbers are ignored.
+
+        :rtype: flag array of new responses
+        """
+        if self.nums:
+            last = self.nums[-1]
+            responses = [i for i in responses if i.num > last]
+        else:
+            responses = list(responses)
+        counts = features(responses)
+        flags = array.array('B', [classify(counts, i)
+                                  for i in range(len(responses))])
+        for index, response in enumerate(responses):
+            key = u''.join(response.message.split())
+            if len(key) >= self.min_copy_length:
+                key = hash(key)
+                if key in self._seen:
+                    flags[index] = flags[index] | COPY
+                else:
+                    self._seen.add(key)
+        self.nums.extend(i.num for i in responses)
+        self.flags.extend(flags)
+        return flags
+
+    def get(self, num):
+        """Return flags of response number, 0 if not classified."""
+        index = bisect.bisect_left(self.nums, num)
+        if index < len(self.nums) and self.nums[index] == num:
+            return self.flags[index]
+        return 0
+
+    def where(self, flag):
+        """Return response numbers having flag."""
+        return [num for num, flags in zip(self.nums, self.flags)
+                if flags & flag]
+
+    def clear(self):
+        """Remove classified responses, shared seen set is kept."""
+        self.nums = array.array('I')
+        self.flags = array.array('B')
@@ -0,0 +1,227 @@
+"""columnar response data of 2ch thread and board.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import bisect
+import collections
+import heapq
+import itertools
+import operator
+import time
+
+from bbs2ch import decode
+
+DAY = 86400.0
+MIN_AGE = 60.0  # seconds, age of threads created in the future or now
+NAN = float('nan')
+
+
+class ThreadColumns(object):
+
+    """Response number, time and poster id arrays of a thread.
+
+    poster ids are interned to codes, ids[i] is index of id_names.
+    responses without time have NaN time.
+    """
+
+    def __init__(self):
+        """initialize attributes."""
+        self.nums = array.array('I')
+        self.times = array.array('d')
+        self.ids = array.array('I')
+        self.id_names = []  # code: poster id string
+        self._id_codes = {}  # poster id string: code
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.columns.ThreadColumns({} responses)>'.format(
+            len(self))
+
+    def __len__(self):
+        """Return added response count."""
+        return len(self.nums)
+
+    def add(self, response):
+        """Add browser.Response.
+
+        responses must be added in number order, added numbers are ignored.
+        """
+        if self.nums and response.num <= self.nums[-1]:
+            return
+        time, poster_id, be = decode.date_id(response.decode_field(2))
+        code = self._id_codes.get(poster_id)
+        if code is None:
+            code = self._id_codes[poster_id] = len(self.id_names)
+            self.id_names.append(poster_id)
+        self.nums.append(response.num)
+        self.times.append(float('nan') if time is None else time)
+        self.ids.append(code)
+
+    def clear(self):
+        """Remove all responses."""
+        self.__init__()
+
+    def id_counts(self):
+        """Return {poster id: response count}."""
+        counts = collections.Counter(self.ids)
+        return dict((self.id_names[k], v) for k, v in counts.items())
+
+    def by_id(self, poster_id):
+        """Return response numbers of poster id."""
+        code = self._id_codes.get(poster_id)
+        if code is None:
+            return []
+        return [num for num, i in zip(self.nums, self.ids) if i == code]
+
+    def time_range(self, start, end):
+        """Return index slice of responses posted in [start, end).
+
+        times are expected to be in posted order.
+        """
+        return slice(bisect.bisect_left(self.times, start),
+                     bisect.bisect_left(self.times, end))
+
+    def rate(self, window, start=None, end=None):
+        """Return response counts per window seconds.
+
+        :param window: seconds of a window
+        :param start: start time, default is first response time
+        :param end: end time, default is last response time
+        :rtype: window start time, count array
+        """
+        times = [i for i in self.times if i == i]  # drop NaN
+        if not times:
+            return (start, array.array('I'))
+        start = times[0] if start is None else start
+        end = times[-1] if end is None else end
+        counts = array.array('I', [0]) * (int((end - start) // window) + 1)
+        for time in times:
+            if start <= time <= end:
+                counts[int((time - start) // window)] += 1
+        return (start, counts)
+
+
+class BoardColumns(object):
+
+    """Dat, response count and velocity arrays of subject.txt threads.
+
+    arrays are in subject.txt order, index i is rank i + 1.
+    velocities are responses per day, NaN if unknown.
+    """
+
+    def __init__(self):
+        """initialize attributes."""
+        self.keys = []  # dat strings
+        self.dats = array.array('d')  # dat as thread created time
+        self.counts = array.array('I')
+        self.time = None  # last update time
+        self.recent = array.array('d')  # velocity since previous update
+        self.accelerations = array.array('d')  # recent change per day
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.columns.BoardColumns({} threads)>'.format(len(self))
+
+    def __len__(self):
+        """Return thread count."""
+        return len(self.keys)
+
+    def update(self, subject, now=None):
+        """Replace arrays by subject.txt threads.
+
+        :param subject: dat, title, response count tuples in rank order
+        :param now: fetched time of subject
+        """
+        now = time.time() if now is None else now
+        keys = [i[0] for i in subject]
+        size = len(keys)
+        counts = array.array('I', [i[2] for i in subject])
+        if self.time is not None and now > self.time:
+            scale = DAY / (now - self.time)
+            index = map(dict(itertools.izip(
+                self.keys, itertools.count())).get,
+                keys, itertools.repeat(-1, size))
+            previous = map((self.counts.tolist() + [NAN]).__getitem__, index)
+            recent = map(operator.mul, map(operator.sub, counts, previous),
+                         itertools.repeat(scale, size))
+            previous = map((self.recent.tolist() + [NAN]).__getitem__, index)
+            accelerations = map(operator.mul,
+                                map(operator.sub, recent, previous),
+                                itertools.repeat(scale, size))
+        else:
+            recent = accelerations = [NAN] * size
+        self.keys = keys
+        self.dats = array.array('d', map(float, keys))
+        self.counts = counts
+        self.recent = array.array('d', recent)
+        self.accelerations = array.array('d', accelerations)
+        self.time = now
+
+    def ranks(self):
+        """Return rank array."""
+        return array.array('I', xrange(1, len(self) + 1))
+
+    def velocity(self, now=None):
+        """Return average velocity array since threads were created.
+
+        :param now: time to measure, default is last update time
+        """
+        now = self.time if now is None else now
+        size = len(self)
+        ages = map(max, map(operator.sub, itertools.repeat(now, size),
+                            self.dats),
+                   itertools.repeat(MIN_AGE, size))
+        return array.array('d', map(
+            operator.truediv,
+            map(operator.mul, self.counts, itertools.repeat(DAY, size)),
+            ages))
+
+    def measure(self, name):
+        """Return velocity, recent or accelerations array by name."""
+        if name == 'velocity':
+            return self.velocity()
+        elif name in ('recent', 'accelerations'):
+            return getattr(self, name)
+        raise ValueError('unknown measure: {}'.format(name))
+
+
+def top_threads(boards, k=10, measure='velocity'):
+    """Return k threads of largest measure across boards.
+
+    :param boards: {board url: BoardColumns}
+    :param measure: velocity, recent or accelerations
+    :rtype: (value, board url, dat) list in descending order
+    """
+    candidates = []
+    for url, board in boards.items():
+        values = board.measure(measure)
+        known = map(operator.eq, values, values)  # False if NaN
+        candidates.extend(heapq.nlargest(k, itertools.compress(
+            itertools.izip(values, itertools.repeat(url), board.keys),
+            known)))
+    return heapq.nlargest(k, candidates)
@@ -0,0 +1,276 @@
+"""crawl 2ch boards and threads concurrently.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import collections
+import Queue
+import random
+import socket
+import threading
+import time
+
+from bbs2ch import browser
+from bbs2ch import http
+
+
+class StatusError(IOError):
+
+    """Server returned error status."""
+
+    def __init__(self, item, status):
+        IOError.__init__(self, 'http status {}: {}'.format(
+            status, getattr(item, 'url', item)))
+        self.item = item
+        self.status = status
+
+
+class TokenBucket(object):
+
+    """Token bucket rate limiter."""
+
+    def __init__(self, rate, capacity=1.0):
+        """initialize attributes.
+
+        :param rate: tokens added per second
+        :param capacity: max tokens
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.crawler.TokenBucket({}, capacity={})>'.format(
+            repr(self.rate), repr(self.capacity))
+
+    def take(self):
+        """Take a token.
+
+        :rtype: 0.0 if token is taken, or seconds to wait for next token
+        """
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens = self.tokens - 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+
+class Crawler(object):
+
+    """Fetch menus, boards and threads by worker threads.
+
+    new responses are put to results queue as (Thread, Response list).
+    """
+
+    def __init__(self, workers=8, host_connections=2, rate=1.0, burst=1.0,
+                 retries=3, backoff=1.0, pool=None):
+        """initialize attributes.
+
+        :param workers: worker thread count
+        :param host_connections: max concurrent requests per host
+        :param rate: max requests per second per host
+        :param burst: token bucket capacity per host
+        :param retries: max retry count of failed request
+        :param backoff: first retry delay seconds, doubled each retry
+        :param pool: http.ConnectionPool object set to crawled items
+        """
+        self.workers = workers
+        self.host_connections = host_connections
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = pool
+        self.results = Queue.Queue()  # (Thread, Response list)
+        self.failed = Queue.Queue()  # (Menu, Board or Thread, exception)
+        self._tasks = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Condition()
+        self._pending = 0  # added but unfinished task count
+        self._active = {}  # host: running request count
+        self._waiting = {}  # host: deque of tasks
+        self._buckets = {}  # host: TokenBucket
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.crawler.Crawler(workers={}, pending={})>'.format(
+            repr(self.workers), repr(self._pending))
+
+    def add(self, item):
+        """Add Menu, Board or Thread to crawl.
+
+        boards of menu and threads of board are added when fetched.
+        """
+        if self.pool and item.pool is None:
+            item.pool = self.pool
+        with self._lock:
+            self._pending = self._pending + 1
+        self._tasks.put(_Task(item))
+
+    def start(self):
+        """Start worker threads."""
+        for i in range(self.workers - len(self._threads)):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._threads.append(worker)
+
+    def join(self, timeout=None):
+        """Wait until all added items are fetched.
+
+        :rtype: True if finished
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._pending:
+                if deadline is None:
+                    self._lock.wait(1.0)
+                elif deadline <= time.time():
+                    return False
+                else:
+                    self._lock.wait(min(1.0, deadline - time.time()))
+        return True
+
+    def stop(self):
+        """Stop worker threads after current requests."""
+        for worker in self._threads:
+            self._tasks.put(None)
+        for worker in self._threads:
+            worker.join()
+        self._threads = []
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            host = _host(task.item)
+            if not self._acquire(host, task):
+                continue
+            wait = self._bucket(host).take()
+            if wait:
+                self._release(host)
+                self._later(wait, task)
+                continue
+            try:
+                self._fetch(task)
+            except (socket.error, IOError) as err:
+                self._release(host)
+                if task.attempt < self.retries and _retryable(err):
+                    delay = self.backoff * (2 ** task.attempt)
+                    task.attempt = task.attempt + 1
+                    self._later(delay * (0.5 + random.random()), task)
+                    continue
+                self.failed.put((task.item, err))
+            except Exception as err:
+                self._release(host)
+                self.failed.put((task.item, err))
+            else:
+                self._release(host)
+            self._done()
+
+    def _fetch(self, task):
+        item = task.item
+        if isinstance(item, browser.Thread):
+            # keep responses recieved before error, state is updated
+            task.responses.extend(item)
+            _check(item)
+            if task.responses:
+                self.results.put((item, task.responses))
+        else:
+            children = list(item)
+            _check(item)
+            for child in children:
+                self.add(child)
+
+    def _acquire(self, host, task):
+        """Return True if request to host can be started."""
+        with self._lock:
+            if self._active.get(host, 0) < self.host_connections:
+                self._active[host] = self._active.get(host, 0) + 1
+                return True
+            self._waiting.setdefault(host, collections.deque()).append(task)
+            return False
+
+    def _release(self, host):
+        with self._lock:
+            self._active[host] = self._active[host] - 1
+            waiting = self._waiting.get(host)
+            if waiting:
+                self._tasks.put(waiting.popleft())
+
+    def _bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def _later(self, delay, task):
+        timer = threading.Timer(delay, self._tasks.put, [task])
+        timer.daemon = True
+        timer.start()
+
+    def _done(self):
+        with self._lock:
+            self._pending = self._pending - 1
+            self._lock.notify_all()
+
+
+class _Task(object):
+
+    """Crawler task state."""
+
+    def __init__(self, item):
+        self.item = item
+        self.attempt = 0
+        self.responses = []
+
+
+def _check(item):
+    """Raise StatusError if last request of item failed."""
+    if item.status >= 300 and item.status not in (304, 416):
+        raise StatusError(item, item.status)
+
+
+def _retryable(err):
+    """Return True if request may succeed later."""
+    if isinstance(err, StatusError):
+        return err.status >= 500 or err.status == 429
+    return True
+
+
+def _host(item):
+    """Return request host of Menu, Board or Thread."""
+    if isinstance(item, browser.Thread):
+        return http.host_path(item.board_url)[0]
+    return http.host_path(item.url)[0]
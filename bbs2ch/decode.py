@@ -26,6 +26,7 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+import calendar
 import re
 
 WRITE_ERROR = 0
@@ -33,41 +34,81 @@ WRITE_OK = 1
 WRITE_COOKIE = 2
 
 
+RE_MENU_CATEGORY = re.compile(u'<B>([^<]+)</B><BR>')
+RE_MENU_BOARD = re.compile(u'<A HREF=(http://[^/]+/[^/]+/)>([^<]+)<')
+RE_BOARD_SUBJECT = re.compile(u'(\\d+).dat<>(.+)\\s\\((\\d+)\\)')
+RE_MENU_ENTRIES = re.compile(
+    u'<B>([^<\\n]+)</B><BR>|'
+    u'^<A HREF=(http://[^/\\n]+/[^/\\n]+/)>([^<\\n]+)<', re.MULTILINE)
+RE_BOARD_SUBJECT_ENTRIES = re.compile(
+    u'^(\\d+).dat<>(.+)[ \\t\\r\\f\\v]\\((\\d+)\\)', re.MULTILINE)
+
+
 def menu(body):
     """decode 2ch menu html to python data struct.
 
     :param body: 2ch menu html string
     :rtype: board url, category, board title tupled list
     """
-    re_category = re.compile(u'<B>([^<]+)</B><BR>')
-    re_board_url = re.compile(u'<A HREF=(http://'
-                              u'[^/]+/[^/]+/)>([^<]+)<')
     current_category = None
     for line in body.split(u'\n'):
-        match_category = re_category.search(line)
+        match_category = RE_MENU_CATEGORY.search(line)
         if match_category:
             current_category = match_category.groups()[0]
         if current_category:
-            match_board_url = re_board_url.match(line)
+            match_board_url = RE_MENU_BOARD.match(line)
             if match_board_url:
                 url, title = match_board_url.groups()
                 yield (url, current_category, title)
 
 
+def menu_bytes(body, encoding='ms932'):
+    """decode raw 2ch menu html in one pass.
+
+    same as menu(body.decode(encoding)), but scans the whole body
+    at once instead of matching line by line.
+
+    :param body: 2ch menu html raw string
+    :param encoding: body encoding
+    :rtype: board url, category, board title tupled list
+    """
+    current_category = None
+    for category, url, title in RE_MENU_ENTRIES.findall(
+            body.decode(encoding, 'replace')):
+        if category:
+            current_category = category
+        elif current_category:
+            yield (url, current_category, title)
+
+
 def board_subject(body):
     """decode 2ch board subject.txt to python data.
 
     :param body: 2ch board subject string
     :rtype: thread dat id, title, rescount tupled list
     """
-    re_threads = re.compile(u'(\\d+).dat<>(.+)\s\\((\\d+)\\)')
     for line in body.split(u'\n'):
-        match_threads = re_threads.match(line)
+        match_threads = RE_BOARD_SUBJECT.match(line)
         if match_threads:
             dat, title, res = match_threads.groups()
             yield (dat, title, int(res))
 
 
+def board_subject_bytes(body, encoding='ms932'):
+    """decode raw 2ch board subject.txt in one pass.
+
+    same as board_subject(body.decode(encoding)), but scans the whole body
+    at once instead of matching line by line.
+
+    :param body: 2ch board subject raw string
+    :param encoding: body encoding
+    :rtype: thread dat id, title, rescount tupled list
+    """
+    for dat, title, res in RE_BOARD_SUBJECT_ENTRIES.findall(
+            body.decode(encoding, 'replace')):
+        yield (dat, title, int(res))
+
+
 def thread_dat(body):
     """decode 2ch thread dat string to python data.
 
@@ -75,20 +116,145 @@ def thread_dat(body):
     :rtype: response name, mail, date_id, message tupled list
     """
     for line in body.split(u'\n'):
-        splitted = line.split(u'<>')
-        if len(splitted) == 5:
-            name, mail, date_id, message, title = splitted
-            yield (name, mail, date_id, message)
-        elif len(splitted) == 6:
-            name, mail, date_id, message, deleted, title = splitted
-            yield (name, mail, date_id, message)
-        elif len(splitted) >= 4:
-            name = u''
-            mail = u''
-            date_id = u''
-            message = u'can not understand this line:</br> %' % (
-                line.replace(u'<>', u'&lt;&gt;'))
-            yield (name, mail, date_id, message)
+        response = thread_dat_line(line)
+        if response:
+            yield response
+
+
+def thread_dat_line(line):
+    """decode one line of 2ch thread dat string.
+
+    :param line: 2ch thread dat line string
+    :rtype: response name, mail, date_id, message tuple or None
+    """
+    splitted = line.split(u'<>')
+    if len(splitted) == 5:
+        name, mail, date_id, message, title = splitted
+        return (name, mail, date_id, message)
+    elif len(splitted) == 6:
+        name, mail, date_id, message, deleted, title = splitted
+        return (name, mail, date_id, message)
+    elif len(splitted) >= 4:
+        name = u''
+        mail = u''
+        date_id = u''
+        message = u'can not understand this line:</br> %s' % (
+            line.replace(u'<>', u'&lt;&gt;'))
+        return (name, mail, date_id, message)
+
+
+def thread_dat_bytes(body, encoding='ms932'):
+    """decode raw 2ch thread dat.
+
+    same as thread_dat(body.decode(encoding)), undecodable bytes are
+    replaced instead of raising.
+
+    :param body: 2ch thread dat raw string
+    :param encoding: body encoding
+    :rtype: response name, mail, date_id, message tupled list
+    """
+    return thread_dat(body.decode(encoding, 'replace'))
+
+
+def iter_lines(chunks, partial=True):
+    """split recieved data strings to lines.
+
+    only one partial line is kept between chunks.
+
+    :param chunks: iterable of data strings
+    :param partial: if False, last line without newline is not returned
+    :rtype: line strings without newline
+    """
+    rest = ''
+    for chunk in chunks:
+        if '\n' not in chunk:
+            rest = rest + chunk
+            continue
+        lines = chunk.split('\n')
+        lines[0] = rest + lines[0]
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest and partial:
+        yield rest
+
+
+RE_ANCHOR = re.compile(
+    u'(?:&gt;|\uff1e){1,2}(\\d+(?:[-\u30fc\u2212\uff0d,\uff0c]\\d+)*)',
+    re.UNICODE)
+RE_ANCHOR_SEPARATOR = re.compile(u'[,\uff0c]')
+RE_ANCHOR_RANGE = re.compile(u'[-\u30fc\u2212\uff0d]')
+MAX_ANCHOR_RANGE = 100
+MAX_ANCHOR_NUMBER = 0xffff  # larger numbers are not response numbers
+
+
+def anchors(message):
+    """decode >>N anchors of response message.
+
+    ranges like >>10-20 and lists like >>1,3 are expanded.
+    a range longer than MAX_ANCHOR_RANGE is truncated,
+    numbers over MAX_ANCHOR_NUMBER are ignored.
+
+    :param message: response message html string
+    :rtype: sorted response number list
+    """
+    numbers = set()
+    for match in RE_ANCHOR.finditer(message):
+        for item in RE_ANCHOR_SEPARATOR.split(match.group(1)):
+            bounds = [int(i) for i in RE_ANCHOR_RANGE.split(item)]
+            start, end = min(bounds), max(bounds)
+            end = min(end, start + MAX_ANCHOR_RANGE - 1, MAX_ANCHOR_NUMBER)
+            numbers.update(range(max(1, start), end + 1))
+    return sorted(numbers)
+
+
+RE_RESPONSE_TIME = re.compile(
+    u'(\\d+)/(\\d+)/(\\d+)[^\\d]*(\\d+):(\\d+):(\\d+)(?:\\.(\\d+))?')
+RE_POSTER_ID = re.compile(u'ID:([^\\s]+)')
+RE_BE = re.compile(u'BE:([^\\s]+)')
+JST_OFFSET = 9 * 60 * 60
+
+
+def date_id(value):
+    """decode 2ch response date_id string.
+
+    :param value: response date_id string, time is JST
+    :rtype: unix time float or None, poster id string, be string
+    """
+    match_id = RE_POSTER_ID.search(value)
+    match_be = RE_BE.search(value)
+    return (response_time(value),
+            match_id.group(1) if match_id else u'',
+            match_be.group(1) if match_be else u'')
+
+
+def response_time(date_id):
+    """decode time of 2ch response date_id string.
+
+    :param date_id: response date_id string, time is JST
+    :rtype: unix time float or None
+    """
+    match = RE_RESPONSE_TIME.search(date_id)
+    if not match:
+        return None
+    fraction = match.group(7)
+    year, month, day, hour, minute, second = [
+        int(i) for i in match.groups()[:6]]
+    if year < 100:
+        year = year + 2000
+    try:
+        seconds = calendar.timegm(
+            (year, month, day, hour, minute, second)) - JST_OFFSET
+    except ValueError:
+        return None
+    if fraction:
+        return seconds + float(u'0.' + fraction)
+    return float(seconds)
+
+
+RE_WRITE_STATUS = re.compile(u'<\\!--\\s2ch_X:([^\\s]+)\\s-->')
+RE_WRITE_HIDDEN = re.compile(
+    u'input\\stype=hidden\\s+name="([^"]+)"\\svalue="([^"]+)"')
 
 
 def thread_write(body):
@@ -97,19 +263,16 @@ def thread_write(body):
     :param body: 2ch /test/bbs.cgi response body string
     :rtype: status string, true, error, cookie
     """
-    re_status = re.compile(u'<\\!--\\s2ch_X:([^\\s]+)\\s-->')
-    match = re_status.search(body)
+    match = RE_WRITE_STATUS.search(body)
     if match:
         return match.group(1).lower()
 
 
 def thread_write_form(body):
     """Get 'hidden' key and value from html."""
-    re_hidden = re.compile(
-        u'input\\stype=hidden\\s+name="([^"]+)"\\svalue="([^"]+)"')
     hidden = None
     for i in body.split(u'<'):
-        search = re_hidden.search(i)
+        search = RE_WRITE_HIDDEN.search(i)
         if search:
             hidden = search.groups()
     if hidden:
@@ -0,0 +1,238 @@
+"""near duplicate responses by MinHash and locality sensitive hashing.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import collections
+import operator
+import random
+import time
+
+from bbs2ch import search
+
+
+def shingles(message, n=4):
+    """Return hash list of character n-grams of normalized message text."""
+    text = search.normalize(search.message_text(message))
+    if len(text) < n:
+        return [hash(text)] if text else []
+    return list(set(map(hash, [text[i:i + n]
+                               for i in range(len(text) - n + 1)])))
+
+
+def signature(hashes, size, mask=0):
+    """Return one permutation MinHash signature array of shingle hashes.
+
+    hashes xor mask are split into size bins by modulo, i-th value is the
+    min hash of bin i, so one pass gives size values instead of size
+    passes of k hash functions.  empty bins borrow the value of the next
+    non-empty bin xor the distance (rotation densification).
+    """
+    hashes = sorted(map(mask.__xor__, hashes), reverse=True)
+    mins = dict(zip(map(size.__rmod__, hashes), hashes))
+    sig = map(mins.get, range(size))
+    if len(mins) < size:
+        value = distance = None
+        for i in range(2 * size - 1, -1, -1):
+            j = i % size
+            if j in mins:
+                value, distance = mins[j], 0
+            elif value is not None:
+                distance = distance + 1
+                sig[j] = value ^ distance
+    return array.array('l', sig)
+
+
+def similarity(a, b):
+    """Return estimated jaccard similarity of signatures."""
+    return sum(map(operator.eq, a, b)) / float(len(a))
+
+
+class DuplicateIndex(object):
+
+    """MinHash LSH index of recent responses of many threads.
+
+    signatures are split into bands, responses having the same band
+    values are candidates of near duplicates.
+    keys are (board url, dat, response number).
+    the oldest responses are evicted over capacity, and band buckets
+    keep the newest bucket_size keys, so lookups take constant time.
+    """
+
+    def __init__(self, size=64, bands=16, n=4, threshold=0.6,
+                 capacity=100000, bucket_size=100, min_shingles=8,
+                 burst_count=5, burst_window=600, seed=0, clock=time.time):
+        """initialize attributes.
+
+        :param size: MinHash signature length, multiple of bands
+        :param bands: LSH bands
+        :param n: characters of shingle
+        :param threshold: min estimated similarity of near duplicates
+        :param capacity: max indexed responses
+        :param bucket_size: max keys of a band bucket
+        :param min_shingles: messages having less shingles are not indexed
+        :param burst_count: near duplicates, including itself, added in
+                            burst_window seconds to flag burst
+        :param burst_window: seconds
+        :param seed: seed of MinHash hash mask
+        :param clock: function returning current time
+        """
+        if size % bands:
+            raise ValueError('size is not a multiple of bands')
+        self.size = size
+        self.n = n
+        self.threshold = threshold
+        self.capacity = capacity
+        self.bucket_size = bucket_size
+        self.min_shingles = min_shingles
+        self.burst_count = burst_count
+        self.burst_window = burst_window
+        self.clock = clock
+        self.bursts = set()  # keys of responses in bursts
+        self._mask = int(random.Random(seed).getrandbits(64) - (1 << 63))
+        self._rows = size // bands
+        self._buckets = [{} for i in range(bands)]  # band value: key deque
+        self._entries = {}  # key: (signature, band values, added time)
+        self._order = collections.deque()  # keys in added order
+        self._fetched = {}  # (board url, dat): last added response number
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.duplicate.DuplicateIndex({} responses)>'.format(
+            len(self))
+
+    def __len__(self):
+        """Return indexed response count."""
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Return True if key is indexed."""
+        return key in self._entries
+
+    def add(self, thread, responses):
+        """Index new responses of thread.
+
+        responses must be added in number order, added numbers are ignored.
+        fed by browser.pipeline(), Thread iteration and so on.
+
+        :param thread: browser.Thread
+        :param responses: browser.Response list
+        :rtype: keys of new responses in bursts
+        """
+        thread_key = (thread.board_url, thread.dat)
+        fetched = self._fetched.get(thread_key, 0)
+        responses = [i for i in responses if i.num > fetched]
+        if not responses:
+            return []
+        self._fetched[thread_key] = responses[-1].num
+        now = self.clock()
+        flagged = []
+        for response in responses:
+            hashes = shingles(response.message, self.n)
+            if len(hashes) < self.min_shingles:
+                continue
+            key = thread_key + (response.num,)
+            sig = signature(hashes, self.size, self._mask)
+            values = self._band_values(sig)
+            if self._burst(key, sig, values, now):
+                flagged.append(key)
+            self._insert(key, sig, values, now)
+        return flagged
+
+    def duplicates(self, key):
+        """Return near duplicates of indexed response.
+
+        :param key: (board url, dat, response number)
+        :rtype: (similarity, key) list, most similar first
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        return [i for i in self._candidates(entry[0], entry[1])
+                if i[1] != key]
+
+    def similar(self, message):
+        """Return indexed near duplicates of message html.
+
+        :rtype: (similarity, key) list, most similar first
+        """
+        hashes = shingles(message, self.n)
+        if not hashes:
+            return []
+        sig = signature(hashes, self.size, self._mask)
+        return self._candidates(sig, self._band_values(sig))
+
+    def _band_values(self, sig):
+        rows = self._rows
+        return [hash(sig[i:i + rows].tostring())
+                for i in range(0, len(sig), rows)]
+
+    def _candidates(self, sig, values):
+        keys = set()
+        for buckets, value in zip(self._buckets, values):
+            keys.update(buckets.get(value, ()))
+        found = []
+        for key in keys:
+            score = similarity(sig, self._entries[key][0])
+            if score >= self.threshold:
+                found.append((score, key))
+        found.sort(key=lambda i: (-i[0], i[1]))
+        return found
+
+    def _burst(self, key, sig, values, now):
+        since = now - self.burst_window
+        recent = [i for score, i in self._candidates(sig, values)
+                  if self._entries[i][2] >= since]
+        if len(recent) + 1 < self.burst_count:
+            return False
+        self.bursts.update(recent)
+        self.bursts.add(key)
+        return True
+
+    def _insert(self, key, sig, values, now):
+        while len(self._entries) >= self.capacity:
+            self._evict()
+        self._entries[key] = (sig, values, now)
+        self._order.append(key)
+        for buckets, value in zip(self._buckets, values):
+            bucket = buckets.get(value)
+            if bucket is None:
+                bucket = buckets[value] = collections.deque(
+                    maxlen=self.bucket_size)
+            bucket.append(key)
+
+    def _evict(self):
+        key = self._order.popleft()
+        sig, values, added = self._entries.pop(key)
+        self.bursts.discard(key)
+        for buckets, value in zip(self._buckets, values):
+            bucket = buckets[value]
+            # the oldest key is at left unless pushed out by maxlen
+            if bucket and bucket[0] == key:
+                bucket.popleft()
+            if not bucket:
+                del buckets[value]
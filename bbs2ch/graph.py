@@ -0,0 +1,101 @@
+"""reply graph of 2ch thread.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import heapq
+
+
+class ReplyGraph(object):
+
+    """Forward and backward >>N anchor lists of a thread.
+
+    lists are arrays indexed by response number.
+    """
+
+    def __init__(self):
+        """initialize attributes."""
+        self._anchors = [None]  # response number: array of anchored numbers
+        self._replies = [None]  # response number: array of replying numbers
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.graph.ReplyGraph({} responses)>'.format(len(self))
+
+    def __len__(self):
+        """Return added response count."""
+        return len(self._anchors) - 1
+
+    def add(self, num, anchors):
+        """Add anchors of response.
+
+        responses must be added in number order, added numbers are ignored.
+
+        :param num: response number
+        :param anchors: anchored response number list
+        """
+        if num < len(self._anchors):
+            return
+        while len(self._anchors) < num:
+            self._anchors.append(None)
+        self._anchors.append(array.array('I', anchors) if anchors else None)
+        for target in anchors:
+            if target >= num:
+                continue  # anchor to future response
+            while len(self._replies) <= target:
+                self._replies.append(None)
+            if self._replies[target] is None:
+                self._replies[target] = array.array('I')
+            self._replies[target].append(num)
+
+    def clear(self):
+        """Remove all responses."""
+        self._anchors = [None]
+        self._replies = [None]
+
+    def anchors(self, num):
+        """Return response numbers anchored by response num."""
+        if 0 < num < len(self._anchors) and self._anchors[num]:
+            return self._anchors[num].tolist()
+        return []
+
+    def replies(self, num):
+        """Return response numbers replying to response num."""
+        if 0 < num < len(self._replies) and self._replies[num]:
+            return self._replies[num].tolist()
+        return []
+
+    def reply_count(self, num):
+        """Return reply count of response num."""
+        if 0 < num < len(self._replies) and self._replies[num]:
+            return len(self._replies[num])
+        return 0
+
+    def popular(self, limit=10):
+        """Return (reply count, response number) list of most replied."""
+        return heapq.nlargest(
+            limit, ((len(v), k) for k, v in enumerate(self._replies) if v))
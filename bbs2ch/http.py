@@ -27,11 +27,36 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+import collections
+import errno
+import os
 import re
+import select
 import socket
-import StringIO
-import gzip
+import struct
+import threading
+import time
 import urllib
+import zlib
+
+# functions called with (event, info dict) of every request.
+# times are seconds and sizes are bytes.
+#
+# u'connect': host, port, dns, connect
+# u'response': host, port, status, cache, reused, send, first_byte,
+#              transfer, decompress, wire_bytes, body_bytes
+# u'decompress': seconds, wire_bytes, body_bytes
+# u'charset': seconds, body_bytes, chars
+# u'parse': url, kind, items, seconds
+hooks = []
+
+CACHE_OUTCOMES = {200: u'full', 206: u'partial', 304: u'not_modified'}
+
+
+def emit(event, info):
+    """call hooks with event name and info dict."""
+    for hook in list(hooks):
+        hook(event, info)
 
 
 def host_path(url):
@@ -45,6 +70,18 @@ def host_path(url):
     return (host, path)
 
 
+def host_port(host, port=80):
+    """return hostname and port from 'hostname:port' string.
+
+    :param host: hostname with or without port
+    :param port: port if host has no port
+    """
+    name, colon, number = host.rpartition(':')
+    if colon and number.isdigit():
+        return (name, int(number))
+    return (host, port)
+
+
 def urlencode(string):
     """Return % encoded string."""
     def _enc(char):
@@ -75,7 +112,6 @@ def encode_request(method, path, header, body=[], encoding='ascii'):
     if body_string:
         header.append((u'Content-Type', u'application/x-www-form-urlencoded'))
         header.append((u'Content-Length', str(len(body_string))))
-    print header
     header_string = '\r\n'.join(
         ['{}: {}'.format(k.encode(encoding), v.encode(encoding))
          for k, v in header])
@@ -83,25 +119,47 @@ def encode_request(method, path, header, body=[], encoding='ascii'):
         request_string, header_string, body_string)
 
 
-def send(host, request, port=80, timeout=20.0):
+def send(host, request, port=80, timeout=20.0, pool=None):
     """send http request.
 
-    :param host: hostname
+    a reused connection closed by server is retried once with
+    new connection. the connection is closed if sending fails.
+
+    :param host: hostname, 'hostname:port' overrides port
     :param request: http request string
     :param port: http socket port
     :param timeout: http connection timeout
+    :param pool: ConnectionPool object or None
     :rtype: socket connection object
     """
-    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    connection.settimeout(timeout)
-    connection.connect((host, port))
-    connection.send(str(request))
-    return connection
+    host, port = host_port(host, port)
+    retry = True
+    while True:
+        if pool:
+            connection = pool.get(host, port)
+        else:
+            connection = _connect(host, port, timeout)
+        try:
+            connection.sendall(str(request))
+            return connection
+        except socket.error:
+            reused = pool and pool.reused(connection)
+            _close(connection, pool)
+            if reused and retry:
+                retry = False
+                continue
+            raise
+        except Exception:
+            _close(connection, pool)
+            raise
 
 
 def recv(connection, timeout=2.0, buffersize=2048, callback=None):
     """receive http request.
 
+    returns as soon as the response body is complete.
+    chunked body is decoded.
+
     :param connection: socket connection object from send()
     :param timeout: http connection timeout
     :param buffersize: socket recive buffer size
@@ -109,30 +167,975 @@ def recv(connection, timeout=2.0, buffersize=2048, callback=None):
                      when recieve data
     :rtype: str
     """
-    response = ''
-    zero_count = 0  # recieved zero data count
-    recv_size = 0  # recieved response header + data size
-    recv_total = None  # will recieved response header + data size
     connection.settimeout(timeout)
+    reader = ResponseReader(connection, buffersize, callback)
+    if hooks:
+        reader.timing = {u'host': None, u'port': None, u'reused': None,
+                         u'send': None}
+    try:
+        return reader.read()
+    finally:
+        reader.emit()
+
+
+def open_response(host, request, port=80, timeout=20.0, pool=None,
+                  callback=None):
+    """send http request and receive response header.
+
+    a reused connection closed by server is retried once with
+    new connection.
+    call release() of returned ResponseReader after reading body.
+
+    :param host: hostname
+    :param request: http request string
+    :param port: http socket port
+    :param timeout: http connection timeout
+    :param pool: ConnectionPool object or None
+    :param callback: recv() callback function
+    :rtype: ResponseReader object
+    """
+    retry = True
     while True:
-        data = connection.recv(buffersize)
-        if len(data):
-            recv_size = recv_size + len(data)
+        start = time.time()
+        connection = send(host, request, port, timeout, pool)
+        try:
+            reader = ResponseReader(connection, callback=callback, pool=pool)
+            if hooks:
+                reader.timing = _timing(host, port, start, pool, connection)
+            reader.read_header()
+            return reader
+        except socket.error:
+            reused = pool and pool.reused(connection)
+            _close(connection, pool)
+            if reused and retry:
+                retry = False
+                continue
+            raise
+        except Exception:
+            # malformed response and so on
+            _close(connection, pool)
+            raise
+
+
+def _close(connection, pool):
+    """Close connection, and count it out of pool if pool is given."""
+    if pool:
+        pool.release(connection, reusable=False)
+    else:
+        connection.close()
+
+
+def fetch(host, request, port=80, timeout=20.0, pool=None, callback=None):
+    """send http request and receive response.
+
+    if pool is given, the connection is returned to pool
+    when the response allows keep-alive.
+
+    :param host: hostname
+    :param request: http request string
+    :param port: http socket port
+    :param timeout: http connection timeout
+    :param pool: ConnectionPool object or None
+    :param callback: recv() callback function
+    :rtype: str
+    """
+    reader = open_response(host, request, port, timeout, pool, callback)
+    try:
+        return reader.read()
+    finally:
+        reader.release()
+
+
+def pipeline(host, requests, port=80, timeout=20.0, pool=None,
+             callback=None):
+    """send http requests at once and yield responses in order.
+
+    all requests are written to one connection before reading responses.
+    if the server closes the connection or disables keep-alive before
+    all responses are read, rest requests are sent one by one.
+    read each ResponseReader before taking next one, unread body is
+    skipped. do not call release() of pipelined readers.
+    a request is never sent again after its reader is yielded, check
+    complete of the reader to know if the body was cut short.
+
+    :param host: hostname
+    :param requests: http request string list
+    :param port: http socket port
+    :param timeout: http connection timeout
+    :param pool: ConnectionPool object or None
+    :param callback: recv() callback function
+    :rtype: ResponseReader iterator
+    """
+    requests = [str(i) for i in requests]
+    done = 0
+    reader = None
+    if len(requests) > 1:
+        connection = send(host, ''.join(requests), port, timeout, pool)
+        data = ''
+        try:
+            while done < len(requests):
+                reader = ResponseReader(connection, callback=callback,
+                                        data=data)
+                try:
+                    reader.read_header()
+                except socket.error:
+                    reader = None
+                    break
+                yield reader
+                for _ in reader.iter_body():
+                    pass
+                done = done + 1
+                if not reader.complete or not reader.keep_alive:
+                    break
+                data = reader.unread()
+        finally:
+            reusable = bool(done == len(requests) and reader and
+                            reader.complete and reader.keep_alive and
+                            not data)
+            if pool:
+                pool.release(connection, reusable=reusable)
+            else:
+                connection.close()
+    for request in requests[done:]:
+        reader = open_response(host, request, port, timeout, pool, callback)
+        try:
+            yield reader
+        finally:
+            reader.release()
+
+
+class ResponseReader(object):
+
+    """Read one http response from connection.
+
+    status line and header are parsed once, then the body is read
+    by Content-Length, chunked encoding or until connection closes.
+    """
+
+    def __init__(self, connection, buffersize=8192, callback=None,
+                 pool=None, data=''):
+        """initialize attributes.
+
+        :param connection: socket connection object from send()
+        :param buffersize: socket recive buffer size
+        :param callback: function calls with
+                         {u'recv': int, u'total': int or None}
+                         when recieve data
+        :param pool: ConnectionPool object connection was taken from
+        :param data: already recieved data of this response
+        """
+        self.connection = connection
+        self.pool = pool
+        self.buffersize = buffersize
+        self.callback = callback
+        self.head = None  # raw status line and header string
+        self.status = None  # (httpver, status code, status string)
+        self.header = None  # decoded header dict
+        self._fields = {}  # lower case header name: value
+        self.length = None  # Content-Length value
+        self.chunked = False
+        self.complete = False  # True if body is read to the end
+        self.closed = False  # True if server closed connection
+        self.recv_size = 0  # recieved response header + data size
+        self.timing = None  # dict of stage times if hooks are set
+        self._chunk = bytearray(buffersize)
+        self._view = memoryview(self._chunk)
+        self._buffer = bytearray(data)  # recieved but unread data
+        self._pos = 0
+
+    @property
+    def keep_alive(self):
+        """Return True if connection can be reused."""
+        if not self.complete or self.closed or self.status is None:
+            return False
+        connection = self._field('connection').lower()
+        if self.status[0] == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def release(self):
+        """Return connection to pool if reusable, or close connection."""
+        if self.connection is None:
+            return
+        self.emit()
+        if self.pool:
+            self.pool.release(self.connection, reusable=self.keep_alive)
         else:
-            zero_count = zero_count + 1
-            if zero_count > 3:
+            self.connection.close()
+        self.connection = None
+
+    def emit(self):
+        """Call hooks with u'response' event once if timing is recorded."""
+        timing = self.timing
+        if timing is None:
+            return
+        self.timing = None
+        first = timing.pop(u'_first', None)
+        last = timing.pop(u'_last', first)
+        sent = timing.pop(u'_sent', None)
+        status = self.status[1] if self.status else None
+        timing.setdefault(u'decompress', 0.0)
+        timing.setdefault(u'body_bytes', None)
+        timing.update({
+            u'status': status,
+            u'cache': CACHE_OUTCOMES.get(status),
+            u'first_byte': first - sent if first and sent else None,
+            u'transfer': last - first if first else None,
+            u'wire_bytes': self.recv_size})
+        emit(u'response', timing)
+
+    def read_header(self):
+        """Read status line and header.
+
+        :rtype: str
+        """
+        if self.head is not None:
+            return self.head
+        start = 0
+        while True:
+            end = self._buffer.find('\r\n\r\n', start)
+            if end >= 0:
                 break
+            start = max(0, len(self._buffer) - 3)
+            if not self._fill():
+                raise socket.error('connection closed before header')
+        self.head = str(self._buffer[:end])
+        self._pos = end + 4
+        (self.status, self.header, self._fields,
+         self.length, self.chunked) = _parse_head(self.head)
+        return self.head
+
+    def iter_body(self):
+        """Yield body data strings as they are recieved."""
+        self.read_header()
+        if self.complete:
+            return
+        if self.status[1] in (204, 304) or 100 <= self.status[1] < 200:
+            self.complete = True
+        elif self.chunked:
+            while True:
+                line = self._readline()
+                if line is None:
+                    return
+                size = int(line.split(';', 1)[0].strip() or '0', 16)
+                if size == 0:
+                    while self._readline():  # trailer
+                        pass
+                    break
+                for data in self._iter_exact(size):
+                    yield data
+                if self._readline() is None:
+                    return
+            self.complete = True
+        elif self.length is not None:
+            for data in self._iter_exact(self.length):
+                yield data
+        else:
+            while True:
+                data = self._take(len(self._buffer))
+                if data:
+                    yield data
+                if not self._fill():
+                    break
+            self.complete = True
+
+    def iter_content(self):
+        """Yield body data strings with Content-Encoding decoded."""
+        self.read_header()
+        return _decode_content(self.iter_body(), self._fields, self.timing)
+
+    def read_body(self):
+        """Read whole body.
+
+        decoded size is added to timing without decoding the body,
+        gzip body size is taken from its trailer.
+
+        :rtype: str
+        """
+        body = self._read_body()
+        if self.timing is not None:
+            self.timing[u'body_bytes'] = _content_size(
+                body, self._fields, self.complete)
+        return body
+
+    def _read_body(self):
+        self.read_header()
+        if self.length is None or self.chunked:
+            body = bytearray()
+            for data in self.iter_body():
+                body.extend(data)
+            return str(body)
+        body = bytearray(self.length)
+        view = memoryview(body)
+        pos = len(self._buffer) - self._pos
+        if pos > self.length:
+            pos = self.length
+        body[:pos] = self._buffer[self._pos:self._pos + pos]
+        self._pos = self._pos + pos
+        while pos < self.length:
+            size = self._recv_into(
+                view[pos:], min(self.buffersize, self.length - pos))
+            if not size:
+                return str(body[:pos])
+            pos = pos + size
+        self.complete = True
+        return str(body)
+
+    def read(self):
+        """Read whole response.
+
+        :rtype: str
+        """
+        self.read_header()
+        body = self.read_body()
+        return '{}\r\n\r\n{}'.format(self.head, body)
+
+    def unread(self):
+        """Return recieved data after the response, of next response.
+
+        :rtype: str
+        """
+        return str(self._buffer[self._pos:])
+
+    def _field(self, name):
+        return self._fields.get(name, u'')
+
+    def _recv_into(self, view, size):
+        size = self.connection.recv_into(view, size)
+        if size:
+            self.recv_size = self.recv_size + size
+            if self.timing is not None:
+                now = time.time()
+                self.timing.setdefault(u'_first', now)
+                self.timing[u'_last'] = now
+        else:
+            self.closed = True
+        if self.callback:
+            self.callback({u'recv': self.recv_size, u'total': self.length})
+        return size
+
+    def _fill(self):
+        """Append recieved data to buffer, return recieved size."""
+        if self._pos and self._pos * 2 >= len(self._buffer):
+            del self._buffer[:self._pos]
+            self._pos = 0
+        size = self._recv_into(self._view, self.buffersize)
+        if size:
+            self._buffer.extend(self._view[:size])
+        return size
+
+    def _take(self, size):
+        data = str(self._buffer[self._pos:self._pos + size])
+        self._pos = self._pos + len(data)
+        return data
+
+    def _readline(self):
+        """Return line without CRLF, or None if connection closed."""
+        scanned = 0  # searched size from self._pos
+        while True:
+            end = self._buffer.find('\r\n', self._pos + scanned)
+            if end >= 0:
+                return self._take(end - self._pos + 2)[:-2]
+            scanned = max(0, len(self._buffer) - self._pos - 1)
+            if not self._fill():
+                return None
+
+    def _iter_exact(self, size):
+        if self._pos < len(self._buffer):
+            data = self._take(size)
+            size = size - len(data)
+            yield data
+        while size > 0:
+            recieved = self._recv_into(
+                self._view, min(self.buffersize, size))
+            if not recieved:
+                return
+            size = size - recieved
+            yield self._view[:recieved].tobytes()
+        if self.length is not None and not self.chunked:
+            self.complete = True
+
+
+class ConnectionPool(object):
+
+    """Keep-alive connection pool.
+
+    Sockets are pooled per (host, port) and may be shared by
+    Menu, Board and Thread objects.
+    """
+
+    def __init__(self, maxsize=4, idle_timeout=30.0, timeout=20.0,
+                 wait_timeout=None):
+        """initialize attributes.
+
+        :param maxsize: max connections per (host, port)
+        :param idle_timeout: seconds to keep idle connection
+        :param timeout: http connection timeout
+        :param wait_timeout: seconds to wait for a free connection,
+                             timeout if None
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.wait_timeout = timeout if wait_timeout is None else wait_timeout
+        self._idle = {}  # (host, port): [(connection, released time)]
+        self._count = {}  # (host, port): opened connection count
+        self._keys = {}  # connection: (host, port)
+        self._reused = set()
+        self._cond = threading.Condition()
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return ('<bbs2ch.http.ConnectionPool('
+                'maxsize={}, idle_timeout={})>'.format(
+                    repr(self.maxsize), repr(self.idle_timeout)))
+
+    def get(self, host, port=80):
+        """Return idle connection or new connection.
+
+        blocks while maxsize connections to (host, port) are in use,
+        raises socket.timeout if no connection is released in wait_timeout.
+        """
+        key = (host, port)
+        deadline = time.time() + self.wait_timeout
+        with self._cond:
+            while True:
+                idle = self._idle.get(key, [])
+                while idle:
+                    connection, released = idle.pop()
+                    if (time.time() - released < self.idle_timeout and
+                            _alive(connection)):
+                        self._reused.add(connection)
+                        return connection
+                    self._discard(connection)
+                if self._count.get(key, 0) < self.maxsize:
+                    self._count[key] = self._count.get(key, 0) + 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise socket.timeout(
+                        'no free connection to {}:{}'.format(host, port))
+                self._cond.wait(remaining)
+        try:
+            connection = _connect(host, port, self.timeout)
+        except socket.error:
+            with self._cond:
+                self._count[key] = self._count[key] - 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._keys[connection] = key
+        return connection
+
+    def reused(self, connection):
+        """Return True if connection was taken from idle connections."""
+        return connection in self._reused
+
+    def release(self, connection, reusable=True):
+        """Return connection to pool, or close if not reusable."""
+        with self._cond:
+            self._reused.discard(connection)
+            if connection not in self._keys:
+                connection.close()
+                return
+            if reusable:
+                key = self._keys[connection]
+                connection.settimeout(self.timeout)
+                self._idle.setdefault(key, []).append(
+                    (connection, time.time()))
+            else:
+                self._discard(connection)
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._cond:
+            for idle in self._idle.values():
+                while idle:
+                    self._discard(idle.pop()[0])
+            self._cond.notify_all()
+
+    def _discard(self, connection):
+        key = self._keys.pop(connection, None)
+        if key:
+            self._count[key] = self._count[key] - 1
+        connection.close()
+
+
+class Resolver(object):
+
+    """Hostname resolver with cache.
+
+    addresses are cached for ttl seconds and failures for negative_ttl
+    seconds. pinned addresses never expire.
+    """
+
+    def __init__(self, ttl=300.0, negative_ttl=30.0, maxsize=1024,
+                 clock=time.time):
+        """initialize attributes.
+
+        :param ttl: seconds to cache resolved addresses
+        :param negative_ttl: seconds to cache resolve errors
+        :param maxsize: max cached hostnames
+        :param clock: function returns current time
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._cache = collections.OrderedDict()  # host: (expires, result)
+        self._pinned = {}  # host: address list
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.http.Resolver(ttl={}, negative_ttl={})>'.format(
+            repr(self.ttl), repr(self.negative_ttl))
+
+    def resolve(self, host, port=80):
+        """Return (address, port) list of host.
 
-        response = response + data
-        if callback:
-            if not recv_total:
-                headerbody = response.split('\r\n\r\n', 1)
-                if len(headerbody) == 2:
-                    header_data = dict(_decode_header(headerbody[0]))
-                    if u'Content-Length' in header_data:
-                        recv_total = int(header_data[u'Content-Length'])
-            callback({u'recv': recv_size, u'total': recv_total})
-    return response
+        :raises socket.gaierror: if host can not be resolved
+        """
+        return [(address, port) for address in self.addresses(host)]
+
+    def addresses(self, host):
+        """Return ip address string list of host."""
+        with self._lock:
+            if host in self._pinned:
+                return self._pinned[host]
+            cached = self._cache.get(host)
+            if cached is not None and cached[0] > self.clock():
+                result = cached[1]
+                if isinstance(result, Exception):
+                    raise result
+                return result
+        try:
+            result = self._lookup(host)
+            expires = self.clock() + self.ttl
+        except socket.gaierror as err:
+            result = err
+            expires = self.clock() + self.negative_ttl
+        with self._lock:
+            self._cache.pop(host, None)
+            self._cache[host] = (expires, result)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def pin(self, host, addresses):
+        """Use addresses for host instead of resolving.
+
+        :param addresses: ip address string list
+        """
+        with self._lock:
+            self._pinned[host] = list(addresses)
+
+    def unpin(self, host):
+        """Resolve host again."""
+        with self._lock:
+            self._pinned.pop(host, None)
+
+    def clear(self):
+        """Forget cached addresses, pinned addresses are kept."""
+        with self._lock:
+            self._cache.clear()
+
+    def _lookup(self, host):
+        addresses = []
+        for info in socket.getaddrinfo(
+                host, None, socket.AF_INET, socket.SOCK_STREAM):
+            if info[4][0] not in addresses:
+                addresses.append(info[4][0])
+        return addresses
+
+
+resolver = Resolver()  # used by send, ConnectionPool and EventLoop
+
+
+class ResponseParser(object):
+
+    """Parse http response fed from non-blocking socket.
+
+    has same status, header, complete and iter_content() as
+    ResponseReader.
+    """
+
+    def __init__(self):
+        """initialize attributes."""
+        self.head = None  # raw status line and header string
+        self.status = None  # (httpver, status code, status string)
+        self.header = None  # decoded header dict
+        self.length = None  # Content-Length value
+        self.chunked = False
+        self.complete = False  # True if body is parsed to the end
+        self.body = []  # recieved body data strings, chunked decoded
+        self._fields = {}  # lower case header name: value
+        self._buffer = bytearray()  # fed but unparsed data
+        self._pos = 0
+        self._state = 'head'
+        self._remain = 0  # unparsed size of body or chunk
+
+    def feed(self, data):
+        """Parse recieved data.
+
+        :rtype: True if response is complete
+        """
+        self._buffer.extend(data)
+        while not self.complete:
+            if self._state == 'head':
+                end = self._buffer.find('\r\n\r\n', self._pos)
+                if end < 0:
+                    break
+                self.head = str(self._buffer[self._pos:end])
+                self._pos = end + 4
+                (self.status, self.header, self._fields,
+                 self.length, self.chunked) = _parse_head(self.head)
+                if (self.status[1] in (204, 304) or
+                        100 <= self.status[1] < 200):
+                    self.complete = True
+                elif self.chunked:
+                    self._state = 'chunk_size'
+                elif self.length is not None:
+                    self._remain = self.length
+                    self._state = 'data'
+                    self.complete = self.length == 0
+                else:
+                    self._state = 'close'
+            elif self._state in ('data', 'chunk_data'):
+                if self._pos == len(self._buffer):
+                    break
+                size = min(self._remain, len(self._buffer) - self._pos)
+                self.body.append(str(
+                    self._buffer[self._pos:self._pos + size]))
+                self._pos = self._pos + size
+                self._remain = self._remain - size
+                if not self._remain:
+                    if self._state == 'data':
+                        self.complete = True
+                    else:
+                        self._state = 'chunk_end'
+            elif self._state == 'close':
+                if self._pos < len(self._buffer):
+                    self.body.append(str(self._buffer[self._pos:]))
+                    self._pos = len(self._buffer)
+                break
+            else:
+                line = self._readline()
+                if line is None:
+                    break
+                if self._state == 'chunk_size':
+                    self._remain = int(
+                        line.split(';', 1)[0].strip() or '0', 16)
+                    self._state = ('chunk_data' if self._remain
+                                   else 'trailer')
+                elif self._state == 'chunk_end':
+                    self._state = 'chunk_size'
+                elif not line:  # end of trailer
+                    self.complete = True
+        if self._pos and self._pos * 2 >= len(self._buffer):
+            del self._buffer[:self._pos]
+            self._pos = 0
+        return self.complete
+
+    def feed_eof(self):
+        """Parse connection close.
+
+        :rtype: True if response is complete
+        """
+        if self._state == 'close':
+            self.complete = True
+        return self.complete
+
+    def iter_content(self):
+        """Yield body data strings with Content-Encoding decoded."""
+        return _decode_content(iter(self.body), self._fields)
+
+    def read(self):
+        """Return whole response with chunked body decoded.
+
+        :rtype: str
+        """
+        return '{}\r\n\r\n{}'.format(self.head, ''.join(self.body))
+
+    def _readline(self):
+        end = self._buffer.find('\r\n', self._pos)
+        if end < 0:
+            return None
+        line = str(self._buffer[self._pos:end])
+        self._pos = end + 2
+        return line
+
+
+class EventLoop(object):
+
+    """Run many http requests concurrently on non-blocking sockets."""
+
+    def __init__(self, timeout=20.0, buffersize=8192):
+        """initialize attributes.
+
+        :param timeout: seconds to wait each request
+        :param buffersize: socket recive buffer size
+        """
+        self.timeout = timeout
+        self.buffersize = buffersize
+        self._requests = {}  # fileno: _Request
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.http.EventLoop({} requests)>'.format(
+            len(self._requests))
+
+    def __len__(self):
+        """Return running request count."""
+        return len(self._requests)
+
+    def request(self, host, request, callback, port=80):
+        """Start http request.
+
+        :param host: hostname, 'hostname:port' overrides port
+        :param request: http request string
+        :param callback: function calls with (ResponseParser, error)
+                         when response is complete or request failed.
+                         error is None or exception object.
+        :param port: http socket port
+        """
+        host, port = host_port(host, port)
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.setblocking(0)
+        pending = _Request(connection, str(request), callback,
+                           time.time() + self.timeout)
+        self._requests[connection.fileno()] = pending
+        try:
+            connection.connect_ex(resolver.resolve(host, port)[0])
+        except socket.error as err:
+            self._finish(pending, err)
+
+    def run(self):
+        """Run until all requests are finished."""
+        while self._requests:
+            self.run_once()
+
+    def run_once(self, timeout=1.0):
+        """Wait socket events once and process them."""
+        readers = [k for k, v in self._requests.items() if v.connected]
+        writers = [k for k, v in self._requests.items() if not v.connected]
+        for fileno in _wait(readers, writers, timeout):
+            pending = self._requests.get(fileno)
+            if pending:
+                self._process(pending)
+        now = time.time()
+        for pending in list(self._requests.values()):
+            if pending.deadline < now:
+                self._finish(pending, socket.timeout('timed out'))
+
+    def _process(self, pending):
+        try:
+            if not pending.connected:
+                error = pending.connection.getsockopt(
+                    socket.SOL_SOCKET, socket.SO_ERROR)
+                if error:
+                    raise socket.error(error, 'connect failed')
+                sent = pending.connection.send(pending.request)
+                pending.request = pending.request[sent:]
+                if not pending.request:
+                    pending.connected = True
+                return
+            data = pending.connection.recv(self.buffersize)
+            if data:
+                if pending.parser.feed(data):
+                    self._finish(pending, None)
+            elif pending.parser.feed_eof():
+                self._finish(pending, None)
+            else:
+                raise socket.error('connection closed')
+        except socket.error as err:
+            self._finish(pending, err)
+
+    def _finish(self, pending, error):
+        self._requests.pop(pending.fileno, None)
+        pending.connection.close()
+        pending.callback(pending.parser, error)
+
+
+class _Request(object):
+
+    """EventLoop request state."""
+
+    def __init__(self, connection, request, callback, deadline):
+        self.connection = connection
+        self.fileno = connection.fileno()
+        self.request = request
+        self.callback = callback
+        self.deadline = deadline
+        self.connected = False  # True if request is sent
+        self.parser = ResponseParser()
+
+
+def _wait(readers, writers, timeout):
+    """Return ready file numbers."""
+    if hasattr(select, 'poll'):
+        poll = select.poll()
+        for fileno in readers:
+            poll.register(fileno, select.POLLIN)
+        for fileno in writers:
+            poll.register(fileno, select.POLLOUT)
+        return [fileno for fileno, event in poll.poll(timeout * 1000)]
+    readable, writable, error = select.select(
+        readers, writers, readers + writers, timeout)
+    return set(readable + writable + error)
+
+
+def _parse_head(head):
+    """Parse response status line and header.
+
+    :rtype: status, header dict, lower case header dict,
+            Content-Length value, chunked
+    """
+    status_line = head.split('\r\n', 1)[0].split(' ', 2)
+    while len(status_line) < 3:
+        status_line.append('')
+    httpver, snum, sstring = status_line
+    status = (httpver, int(snum), sstring)
+    header = dict(_decode_header(head))
+    fields = dict((k.lower(), v) for k, v in header.items())
+    length = None
+    chunked = 'chunked' in fields.get('transfer-encoding', u'').lower()
+    if not chunked and fields.get('content-length', u'').isdigit():
+        length = int(fields['content-length'])
+    return (status, header, fields, length, chunked)
+
+
+def _decode_content(chunks, fields, timing=None):
+    """Yield body data strings with Content-Encoding decoded.
+
+    decompress time and decoded size are added to timing dict if given.
+    """
+    if fields.get('content-encoding', u'').lower() != 'gzip':
+        size = 0
+        for data in chunks:
+            size = size + len(data)
+            yield data
+        if timing is not None:
+            timing[u'body_bytes'] = size
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    seconds = 0.0
+    size = 0
+    for data in chunks:
+        start = time.time()
+        data = decompressor.decompress(data)
+        seconds = seconds + time.time() - start
+        if data:
+            size = size + len(data)
+            yield data
+    data = decompressor.flush()
+    size = size + len(data)
+    if timing is not None:
+        timing[u'decompress'] = seconds
+        timing[u'body_bytes'] = size
+    if data:
+        yield data
+
+
+def _content_size(body, fields, complete=True):
+    """Return size of body with Content-Encoding decoded or None.
+
+    size of gzip body is ISIZE of its trailer, modulo 2 ** 32.
+    """
+    if fields.get('content-encoding', u'').lower() != 'gzip':
+        return len(body)
+    if not complete or len(body) < 18:
+        return None
+    return struct.unpack('<I', body[-4:])[0]
+
+
+def _timing(host, port, start, pool, connection):
+    """Return initial timing dict of request sent at start."""
+    now = time.time()
+    host, port = host_port(host, port)
+    return {u'host': host, u'port': port,
+            u'reused': bool(pool and pool.reused(connection)),
+            u'send': now - start, u'_sent': now}
+
+
+def _connect(host, port, timeout, delay=0.25):
+    """Return socket connected to one of resolved addresses of host.
+
+    if host has many addresses, next address is tried in parallel
+    when connecting does not finish in delay seconds.
+    """
+    start = time.time()
+    addresses = resolver.resolve(host, port)
+    resolved = time.time()
+    if len(addresses) == 1:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        try:
+            connection.connect(addresses[0])
+        except socket.error:
+            connection.close()
+            raise
+    else:
+        connection = _connect_any(addresses, timeout, delay)
+    if hooks:
+        emit(u'connect', {u'host': host, u'port': port,
+                          u'address': connection.getpeername()[0],
+                          u'dns': resolved - start,
+                          u'connect': time.time() - resolved})
+    return connection
+
+
+def _connect_any(addresses, timeout, delay):
+    """Connect addresses staggered by delay, return first connected."""
+    deadline = time.time() + timeout
+    pending = {}  # fileno: socket
+    error = socket.timeout('timed out')
+    addresses = list(addresses)
+    try:
+        while time.time() < deadline and (pending or addresses):
+            if addresses:
+                connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                connection.setblocking(0)
+                code = connection.connect_ex(addresses.pop(0))
+                if code in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    pending[connection.fileno()] = connection
+                else:
+                    error = socket.error(code, os.strerror(code))
+                    connection.close()
+                    continue
+            wait = deadline - time.time()
+            if addresses:
+                wait = min(wait, delay)
+            for fileno in _wait([], list(pending), max(0, wait)):
+                connection = pending.pop(fileno)
+                code = connection.getsockopt(
+                    socket.SOL_SOCKET, socket.SO_ERROR)
+                if code == 0:
+                    connection.settimeout(timeout)
+                    return connection
+                error = socket.error(code, os.strerror(code))
+                connection.close()
+        raise error
+    finally:
+        for connection in pending.values():
+            connection.close()
+
+
+def _alive(connection):
+    """Return False if idle connection is closed or has unexpected data."""
+    try:
+        # select() can not watch file numbers over FD_SETSIZE
+        if hasattr(select, 'poll'):
+            poll = select.poll()
+            poll.register(connection, select.POLLIN | select.POLLPRI)
+            return not poll.poll(0)
+        readable = select.select([connection], [], [], 0)[0]
+    except (select.error, socket.error, ValueError):
+        return False
+    return not readable
 
 
 def _convert_http_charset_to_python_charset(charset):
@@ -204,37 +1207,65 @@ def decode_response(response, fallback_encoding='ms932'):
     :param force_encoding: encoding
     :type force_encoding: string encoding label or None
     """
-    encoding = None
-    header, body = response.split('\r\n\r\n', 1)
+    status, header_dict, body, encoding = decode_response_raw(
+        response, fallback_encoding)
     length = len(body)
+    start = time.time()
+    body = body.decode(encoding, errors='replace')
+    if hooks:
+        emit(u'charset', {u'seconds': time.time() - start,
+                          u'body_bytes': length, u'chars': len(body)})
+    return (status, header_dict, body, length)
+
+
+def decode_response_raw(response, fallback_encoding='ms932'):
+    """decode socket recieved data without decoding body charset.
+
+    :param response: string raw response data
+    :param fallback_encoding: encoding if response has no charset
+    :rtype: status, header dict, gzip decoded body string, body encoding
+    """
+    header, body = response.split('\r\n\r\n', 1)
     (httpver, snum, sstring) = header.splitlines()[0].split(' ', 2)
     status = (httpver, int(snum), sstring)
     header_dict = dict(_decode_header(header, fallback_encoding))
     if (u'Content-Encoding' in header_dict and
             header_dict[u'Content-Encoding'] == u'gzip'):
-        # if gziped, decode gzip and update body length
-        io = StringIO.StringIO(body)
-        f = gzip.GzipFile(fileobj=io)
-        body = f.read()
-        length = len(body)
-        f.close()
+        # if gziped, decode gzip
+        start = time.time()
+        wire_bytes = len(body)
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if hooks:
+            emit(u'decompress', {u'seconds': time.time() - start,
+                                 u'wire_bytes': wire_bytes,
+                                 u'body_bytes': len(body)})
+    encoding = content_charset(header_dict, fallback_encoding)
     if u'Content-Type' in header_dict:
-        # if content type includes charset, set encoding
-        content_params = header_dict[u'Content-Type'][2]
-        if u'charset' in content_params:
-            encoding = _convert_http_charset_to_python_charset(
-                content_params[u'charset'])
         # if content type is text/html, read encoding from html meta tag
         main, sub = header_dict[u'Content-Type'][:2]
         if (main, sub) == (u'text', u'html'):
             encoding = _convert_http_charset_to_python_charset(
                 _extract_html_encoding(body))
+    return (status, header_dict, body, encoding)
+
+
+def content_charset(header_dict, fallback_encoding='ms932'):
+    """Return python encoding name from Content-Type header.
+
+    :param header_dict: decoded header dict
+    :param fallback_encoding: encoding if header has no charset
+    """
+    encoding = None
+    if u'Content-Type' in header_dict:
+        # if content type includes charset, set encoding
+        content_params = header_dict[u'Content-Type'][2]
+        if u'charset' in content_params:
+            encoding = _convert_http_charset_to_python_charset(
+                content_params[u'charset'])
     if not encoding:
         if fallback_encoding:
             # if force encoding, set encoding
             encoding = fallback_encoding
         else:
             encoding = 'ascii'
-
-    body = body.decode(encoding, errors='replace')
-    return (status, header_dict, body, length)
+    return encoding
@@ -0,0 +1,305 @@
+"""bulk import of local dat archives.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import collections
+import gzip
+import itertools
+import multiprocessing
+import os
+
+from bbs2ch import decode
+
+ParsedDat = collections.namedtuple(
+    'ParsedDat', ['path', 'body', 'count', 'responses', 'error'])
+
+
+def find_dats(directory):
+    """Yield .dat and .dat.gz file paths under directory in sorted order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.dat') or name.endswith('.dat.gz'):
+                yield os.path.join(root, name)
+
+
+def board_name(path):
+    """Return board name of dat path.
+
+    board of kako layout <board>/kako/<digits>/.../<dat> is the directory
+    before kako, otherwise the parent directory name of dat.
+
+    :rtype: str
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    parent = os.path.basename(directory)
+    name = parent
+    while name.isdigit():
+        directory = os.path.dirname(directory)
+        name = os.path.basename(directory)
+    if name == 'kako' and name != parent:
+        return os.path.basename(os.path.dirname(directory))
+    return parent
+
+
+def dat_key(path):
+    """Return (directory, dat) of .dat or .dat.gz path."""
+    return (os.path.dirname(path), os.path.basename(path).split('.', 1)[0])
+
+
+def parse_dat(path, encoding='ms932', responses=False, writer=None):
+    """Read and parse dat file.
+
+    a broken file does not raise but returns ParsedDat with error.
+
+    :param path: .dat or gzip compressed .dat.gz file path
+    :param encoding: dat encoding
+    :param responses: keep parsed response tuples if True,
+                      otherwise responses of ParsedDat is None
+    :param writer: object has write(ParsedDat) like StoreSink, body
+                   and responses of returned ParsedDat are dropped
+                   after writing
+    :rtype: ParsedDat of raw dat, response count and response tuples,
+            error is None or error message string
+    """
+    try:
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                body = f.read()
+        else:
+            with open(path, 'rb') as f:
+                body = f.read()
+        parsed = list(decode.thread_dat_bytes(body, encoding))
+        result = ParsedDat(path, body, len(parsed),
+                           parsed if responses else None, None)
+        if writer is not None:
+            writer.write(result)
+            result = ParsedDat(path, '', len(parsed), None, None)
+    except Exception as err:
+        # zlib.error, EOFError and so on of a broken archive
+        return ParsedDat(path, '', 0, None, '{}: {}'.format(
+            type(err).__name__, err))
+    return result
+
+
+def _parse_dat(args):
+    return parse_dat(*args)
+
+
+class Importer(object):
+
+    """Parse dat files in worker processes and write them to sink.
+
+    imported paths are appended to journal file, and skipped when
+    run again with the same journal.
+    paths of the same key, like x.dat and x.dat.gz, are imported once,
+    the first path given or imported before is taken.
+    """
+
+    def __init__(self, sink=None, processes=None, batch_size=100,
+                 journal=None, callback=None, encoding='ms932',
+                 responses=False, chunksize=8, writer=None, key=dat_key):
+        """initialize attributes.
+
+        :param sink: function calls with ParsedDat list in this process
+        :param processes: worker process count, default is cpu count.
+                          1 parses in this process.
+        :param batch_size: ParsedDat count passed to sink at once
+        :param journal: imported path list file or None
+        :param callback: function calls with run() status dict
+                         after each batch
+        :param encoding: dat encoding
+        :param responses: pass parsed response tuples to sink.
+                          sending them from workers costs more than
+                          parsing, so raw dat only by default.
+        :param chunksize: dat files sent to a worker at once
+        :param writer: picklable object, like StoreSink, whose
+                       write(ParsedDat) is called in worker processes.
+                       ParsedDat passed to sink has no body then.
+        :param key: function returns thread key of path,
+                    like StoreSink.key
+        """
+        self.sink = sink
+        self.processes = processes
+        self.batch_size = batch_size
+        self.journal = journal
+        self.callback = callback
+        self.encoding = encoding
+        self.responses = responses
+        self.chunksize = chunksize
+        self.writer = writer
+        self.key = key
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.importer.Importer(processes={}, journal={})>'.format(
+            repr(self.processes), repr(self.journal))
+
+    def imported(self):
+        """Return set of paths recorded in journal."""
+        if not self.journal or not os.path.exists(self.journal):
+            return set()
+        with open(self.journal, 'rb') as f:
+            return set(f.read().splitlines())
+
+    def run(self, paths):
+        """Import dat files.
+
+        :param paths: dat file path list
+        :rtype: {u'done': int, u'total': int, u'responses': int,
+                 u'errors': int, u'skipped': int, u'duplicates': int,
+                 u'failed': [(path, error message), ...]}
+        """
+        imported = self.imported()
+        keys = set(self.key(i) for i in imported)
+        unique = []
+        duplicates = 0
+        for path in paths:
+            if path in imported:
+                continue
+            key = self.key(path)
+            if key in keys:
+                duplicates += 1
+            else:
+                keys.add(key)
+                unique.append(path)
+        paths = unique
+        status = {u'done': 0, u'total': len(paths), u'responses': 0,
+                  u'errors': 0, u'skipped': len(imported),
+                  u'duplicates': duplicates, u'failed': []}
+        tasks = [(path, self.encoding, self.responses, self.writer)
+                 for path in paths]
+        pool = None
+        if self.processes == 1:
+            results = itertools.imap(_parse_dat, tasks)
+        else:
+            pool = multiprocessing.Pool(self.processes)
+            results = pool.imap_unordered(_parse_dat, tasks, self.chunksize)
+        journal = open(self.journal, 'ab') if self.journal else None
+        try:
+            batch = []
+            for parsed in results:
+                if parsed.error is None:
+                    batch.append(parsed)
+                else:
+                    status[u'errors'] += 1
+                    status[u'failed'].append((parsed.path, parsed.error))
+                status[u'done'] += 1
+                if len(batch) >= self.batch_size:
+                    self._write(batch, journal, status)
+                    batch = []
+            self._write(batch, journal, status)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            if journal is not None:
+                journal.close()
+        return status
+
+    def _write(self, batch, journal, status):
+        if batch:
+            if self.sink is not None:
+                self.sink(batch)
+            status[u'responses'] += sum(i.count for i in batch)
+            if journal is not None:
+                journal.write(''.join(i.path + '\n' for i in batch))
+                journal.flush()
+        if self.callback:
+            info = dict(status)
+            info[u'failed'] = list(status[u'failed'])
+            self.callback(info)
+
+
+class StoreSink(object):
+
+    """Write raw dat of ParsedDat to DatStore.
+
+    board url is http://<host>/<board>/ of dat path.
+    """
+
+    def __init__(self, store, host=u'localhost', board=board_name):
+        """initialize attributes.
+
+        :param store: store.DatStore object
+        :param host: hostname of board urls
+        :param board: picklable function returns board name of dat path
+        """
+        self.store = store
+        self.host = host
+        self.board = board
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.importer.StoreSink({}, {})>'.format(
+            repr(self.store), repr(self.host))
+
+    def board_url(self, path):
+        """Return board url of dat path."""
+        return u'http://{}/{}/'.format(self.host, self.board(path))
+
+    def key(self, path):
+        """Return (board url, dat) of dat path."""
+        return (self.board_url(path), dat_key(path)[1])
+
+    def __call__(self, batch):
+        """Replace stored dat by ParsedDat list."""
+        for parsed in batch:
+            self.write(parsed)
+
+    def write(self, parsed):
+        """Replace stored dat by ParsedDat.
+
+        dat files are written independently, so Importer may call this
+        in worker processes.
+        """
+        board_url, dat = self.key(parsed.path)
+        dat_file = self.store.open(board_url, dat)
+        try:
+            dat_file.truncate()
+            lines = parsed.body.split('\n')
+            if not lines[-1]:
+                lines.pop()
+            for line in lines:
+                dat_file.append(line)
+        finally:
+            dat_file.close()
+
+
+def import_directory(directory, store, host=u'localhost', board=board_name,
+                     **kwargs):
+    """Import dat files under directory to DatStore.
+
+    dat files are written by worker processes,
+    keyword arguments are passed to Importer.
+
+    :param board: function returns board name of dat path, see StoreSink
+    :rtype: Importer.run() status dict
+    """
+    writer = StoreSink(store, host, board)
+    importer = Importer(writer=writer, key=writer.key, **kwargs)
+    return importer.run(list(find_dats(directory)))
@@ -0,0 +1,151 @@
+"""url links in 2ch thread messages.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import bisect
+import collections
+import re
+
+# ttp:// and ttps:// are h-less urls to avoid auto link,
+# sssp:// is be icon url
+RE_URL = re.compile(
+    u'(?:h?(ttps?)|(sssp))://'
+    u'((?:[^\\s|^<@/?#]*@)?([^\\s|^</?#]*)[^\\s|^<]*)')
+
+Link = collections.namedtuple(
+    'Link', ['board_url', 'dat', 'num', 'url', 'host'])
+
+
+def urls(text):
+    """Return url list in text with h-less and sssp schemes fixed."""
+    return [u'h' + scheme + u'://' + rest if scheme else u'http://' + rest
+            for scheme, sssp, rest, host in RE_URL.findall(text)]
+
+
+def thread_links(board_url, dat, responses):
+    """Return Link list of urls in messages of thread.
+
+    messages are joined and scanned at once.
+
+    :param board_url: board url of thread
+    :param dat: thread key of Link
+    :param responses: browser.Response list
+    """
+    nums = []
+    starts = []  # message start offset in joined buffer
+    messages = []
+    offset = 0
+    for response in responses:
+        message = response.message
+        nums.append(response.num)
+        starts.append(offset)
+        messages.append(message)
+        offset = offset + len(message) + 1
+    links = []
+    bisect_right = bisect.bisect_right
+    for match in RE_URL.finditer(u'\n'.join(messages)):
+        scheme, sssp, rest, host = match.groups()
+        links.append(Link(
+            board_url, dat, nums[bisect_right(starts, match.start()) - 1],
+            u'h' + scheme + u'://' + rest if scheme else u'http://' + rest,
+            host.lower()))
+    return links
+
+
+class LinkIndex(object):
+
+    """Link lists by host of many threads.
+
+    threads are identified by (board url, dat), dat of different boards
+    may be the same.
+    """
+
+    def __init__(self):
+        """initialize attributes."""
+        self._hosts = collections.defaultdict(list)  # host: Link list
+        self._threads = {}  # (board url, dat): Link list
+        self._fetched = {}  # (board url, dat): last added response number
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.links.LinkIndex({} hosts)>'.format(len(self._hosts))
+
+    def __len__(self):
+        """Return Link count."""
+        return sum(len(i) for i in self._hosts.values())
+
+    def add(self, thread, responses):
+        """Add links of new responses of thread.
+
+        responses must be added in number order, added numbers are ignored.
+
+        :param thread: browser.Thread
+        :param responses: browser.Response list
+        :rtype: added Link list
+        """
+        key = (thread.board_url, thread.dat)
+        fetched = self._fetched.get(key, 0)
+        responses = [i for i in responses if i.num > fetched]
+        if not responses:
+            return []
+        self._fetched[key] = responses[-1].num
+        links = thread_links(thread.board_url, thread.dat, responses)
+        self._threads.setdefault(key, []).extend(links)
+        for link in links:
+            self._hosts[link.host].append(link)
+        return links
+
+    def remove(self, thread):
+        """Remove links of thread."""
+        key = (thread.board_url, thread.dat)
+        self._fetched.pop(key, None)
+        removed = set(id(i) for i in self._threads.pop(key, ()))
+        if not removed:
+            return
+        for host, links in self._hosts.items():
+            links[:] = [i for i in links if id(i) not in removed]
+            if not links:
+                del self._hosts[host]
+
+    def hosts(self):
+        """Return {host: Link count}."""
+        return dict((k, len(v)) for k, v in self._hosts.items())
+
+    def links(self, host):
+        """Return Link list of host."""
+        return list(self._hosts.get(host.lower(), []))
+
+    def urls(self, host):
+        """Return url list of host without duplicates in first found order."""
+        seen = set()
+        found = []
+        for link in self._hosts.get(host.lower(), []):
+            if link.url not in seen:
+                seen.add(link.url)
+                found.append(link.url)
+        return found
+
@@ -0,0 +1,245 @@
+"""poll many 2ch threads adaptively.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import heapq
+import itertools
+import socket
+import time
+
+from bbs2ch import decode
+
+
+class Scheduler(object):
+
+    """Poll threads at intervals estimated from post velocity.
+
+    threads with 1000 responses or not modified many times are retired.
+    """
+
+    def __init__(self, min_interval=30.0, max_interval=3600.0,
+                 board_interval=300.0, smoothing=0.5,
+                 retire_count=1000, retire_not_modified=12,
+                 clock=time.time, sleep=time.sleep):
+        """initialize attributes.
+
+        :param min_interval: min seconds between thread polls
+        :param max_interval: max seconds between thread polls
+        :param board_interval: seconds between subject.txt polls
+        :param smoothing: weight of newest velocity in moving average
+        :param retire_count: response count to retire thread
+        :param retire_not_modified: not modified poll count to retire thread
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.board_interval = board_interval
+        self.smoothing = smoothing
+        self.retire_count = retire_count
+        self.retire_not_modified = retire_not_modified
+        self.clock = clock
+        self.sleep = sleep
+        self.retired = []  # retired Thread list
+        self.errors = []  # (Thread or Board, exception) of last poll
+        self._queue = []  # (due time, sequence, _Watch)
+        self._watches = {}  # (board url, dat): _Watch
+        self._sequence = itertools.count()
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.scheduler.Scheduler({} watches)>'.format(
+            len(self._watches))
+
+    def __len__(self):
+        """Return watched thread and board count."""
+        return len(self._watches)
+
+    def add(self, thread, when=None):
+        """Watch thread.
+
+        :param thread: browser.Thread object
+        :param when: first poll time, default is now
+        """
+        now = self.clock()
+        velocity = 0.0
+        if thread.dat.isdigit() and thread.total:
+            velocity = thread.total / max(1.0, now - int(thread.dat))
+        watch = _Watch(thread, (thread.board_url, thread.dat), velocity)
+        self.remove(thread)
+        self._watches[watch.key] = watch
+        self._push(watch, now if when is None else when)
+
+    def add_board(self, board, when=None):
+        """Poll board subject.txt to update watched threads.
+
+        :param board: browser.Board object
+        :param when: first poll time, default is now
+        """
+        watch = _Watch(board, (board.url, None), 0.0)
+        self.remove(board)
+        self._watches[watch.key] = watch
+        self._push(watch, self.clock() if when is None else when)
+
+    def remove(self, item):
+        """Stop watching Thread or Board."""
+        if hasattr(item, 'dat'):
+            key = (item.board_url, item.dat)
+        else:
+            key = (item.url, None)
+        watch = self._watches.pop(key, None)
+        if watch:
+            watch.removed = True
+
+    def next_time(self):
+        """Return next poll time or None."""
+        self._drop_removed()
+        return self._queue[0][0] if self._queue else None
+
+    def poll(self):
+        """Fetch due threads and boards.
+
+        failed fetches are put to errors and polled again later
+        like not modified polls.
+
+        :rtype: (Thread, new Response list) list
+        """
+        now = self.clock()
+        results = []
+        self.errors = []
+        while True:
+            self._drop_removed()
+            if not self._queue or self._queue[0][0] > now:
+                break
+            due, sequence, watch = heapq.heappop(self._queue)
+            try:
+                if watch.key[1] is None:
+                    self._poll_board(watch, now)
+                else:
+                    responses = self._poll_thread(watch, now)
+                    if responses:
+                        results.append((watch.item, responses))
+            except (socket.error, IOError) as err:
+                self.errors.append((watch.item, err))
+                self._poll_failed(watch, now)
+        return results
+
+    def __iter__(self):
+        """Return (Thread, new Response list) while watching."""
+        while True:
+            due = self.next_time()
+            if due is None:
+                return
+            wait = due - self.clock()
+            if wait > 0:
+                self.sleep(wait)
+            for result in self.poll():
+                yield result
+
+    def _poll_thread(self, watch, now):
+        thread = watch.item
+        responses = list(thread)
+        elapsed = self.min_interval
+        if watch.polled is not None:
+            elapsed = max(elapsed, now - watch.polled)
+        if responses:
+            watch.not_modified = 0
+            times = [decode.response_time(i.date_id) for i in responses]
+            times = [i for i in times if i]
+            if len(times) > 1 and times[-1] > times[0]:
+                observed = (len(times) - 1) / (times[-1] - times[0])
+            else:
+                observed = len(responses) / elapsed
+        else:
+            watch.not_modified = watch.not_modified + 1
+            observed = 0.0
+        if watch.polled is not None:
+            watch.velocity = (self.smoothing * observed +
+                              (1.0 - self.smoothing) * watch.velocity)
+        else:
+            watch.velocity = max(observed, watch.velocity)
+        watch.polled = now
+        if (thread.fetched >= self.retire_count or
+                watch.not_modified >= self.retire_not_modified):
+            self._watches.pop(watch.key, None)
+            self.retired.append(thread)
+            return responses
+        self._push(watch, now + self._interval(watch))
+        return responses
+
+    def _poll_board(self, watch, now):
+        for thread in watch.item:
+            found = self._watches.get((thread.board_url, thread.dat))
+            if found is None or found.removed:
+                continue
+            found.item.rank = thread.rank
+            found.item.total = thread.total
+            if thread.total > found.item.fetched and found.due > now:
+                # new responses are posted, poll soon
+                found.removed = True
+                found = _Watch(found.item, found.key, found.velocity,
+                               found.polled, found.not_modified)
+                self._watches[found.key] = found
+                self._push(found, now)
+        watch.polled = now
+        self._push(watch, now + self.board_interval)
+
+    def _poll_failed(self, watch, now):
+        watch.polled = now
+        if watch.key[1] is None:
+            self._push(watch, now + self.board_interval)
+            return
+        watch.not_modified = watch.not_modified + 1
+        self._push(watch, now + self._interval(watch))
+
+    def _interval(self, watch):
+        if watch.velocity > 0.0:
+            interval = 1.0 / watch.velocity
+        else:
+            interval = self.max_interval
+        interval = interval * (2 ** watch.not_modified)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _push(self, watch, due):
+        watch.due = due
+        heapq.heappush(self._queue, (due, next(self._sequence), watch))
+
+    def _drop_removed(self):
+        while self._queue and self._queue[0][2].removed:
+            heapq.heappop(self._queue)
+
+
+class _Watch(object):
+
+    """Scheduler state of a thread or board."""
+
+    def __init__(self, item, key, velocity, polled=None, not_modified=0):
+        self.item = item
+        self.key = key
+        self.velocity = velocity  # responses per second
+        self.polled = polled  # last poll time
+        self.not_modified = not_modified  # polls without new response
+        self.due = None
+        self.removed = False
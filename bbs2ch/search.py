@@ -0,0 +1,311 @@
+"""search 2ch threads and responses.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import collections
+import marshal
+import re
+import unicodedata
+
+RE_TAG = re.compile(u'<[^>]*>')
+ENTITIES = [(u'&gt;', u'>'), (u'&lt;', u'<'), (u'&quot;', u'"'),
+            (u'&nbsp;', u' '), (u'&amp;', u'&')]
+RE_QUERY = re.compile(u'"([^"]+)"|(\\S+)')
+
+
+def normalize(text):
+    """Return text for indexing.
+
+    full width alphabets and numbers are converted to half width,
+    upper case letters to lower case, and spaces are removed.
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    return u''.join(text.split())
+
+
+def message_text(message):
+    """Return plain text of response message html."""
+    text = RE_TAG.sub(u' ', message)
+    for entity, char in ENTITIES:
+        text = text.replace(entity, char)
+    return text
+
+
+def ngrams(text, n=2):
+    """Return character n-gram set of normalized text."""
+    text = normalize(text)
+    if len(text) < n:
+        return set([text]) if text else set()
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class TitleIndex(object):
+
+    """Character n-gram index of thread titles."""
+
+    def __init__(self, n=2):
+        """initialize attributes.
+
+        :param n: characters of n-gram
+        """
+        self.n = n
+        self._postings = {}  # n-gram: set of keys
+        self._threads = {}  # key: (Thread, indexed title, n-gram set)
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.search.TitleIndex({} threads)>'.format(
+            len(self._threads))
+
+    def __len__(self):
+        """Return indexed thread count."""
+        return len(self._threads)
+
+    def add(self, thread):
+        """Add or update thread title."""
+        key = (thread.board_url, thread.dat)
+        if key in self._threads:
+            if self._threads[key][1] == thread.title:
+                self._threads[key] = (thread,) + self._threads[key][1:]
+                return
+            self.remove(thread)
+        grams = ngrams(thread.title, self.n)
+        self._threads[key] = (thread, thread.title, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, thread):
+        """Remove thread."""
+        key = (thread.board_url, thread.dat)
+        if key not in self._threads:
+            return
+        for gram in self._threads.pop(key)[2]:
+            keys = self._postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[gram]
+
+    def update(self, changes):
+        """Update index by browser.BoardChanges."""
+        for thread in changes.removed:
+            self.remove(thread)
+        for threads in (changes.new, changes.count_changed,
+                        changes.rank_moved):
+            for thread in threads:
+                self.add(thread)
+
+    def search(self, text, limit=10):
+        """Return threads similar to text.
+
+        :param text: query string
+        :param limit: max result count
+        :rtype: (score, Thread) list, score is 0.0 to 1.0
+        """
+        grams = ngrams(text, self.n)
+        if not grams:
+            return []
+        counts = collections.Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        results = []
+        for key, count in counts.items():
+            thread, title, thread_grams = self._threads[key]
+            score = 2.0 * count / (len(grams) + len(thread_grams))
+            results.append((score, thread))
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results[:limit]
+
+    def next_thread(self, thread, limit=10, min_score=0.5):
+        """Return next thread candidates newer than thread.
+
+        :param min_score: min score of candidates
+        :rtype: (score, Thread) list
+        """
+        results = []
+        for score, candidate in self.search(thread.title, limit=None):
+            if score < min_score:
+                break
+            if candidate == thread:
+                continue
+            if (thread.dat.isdigit() and candidate.dat.isdigit() and
+                    int(candidate.dat) <= int(thread.dat)):
+                continue
+            results.append((score, candidate))
+        return results[:limit]
+
+
+class TextIndex(object):
+
+    """Character bigram inverted index of response messages.
+
+    postings are (board url, dat, response number) keys, packed in
+    arrays as thread id << NUM_BITS | response number, with n-gram
+    positions in normalized message text to match phrases.
+    """
+
+    NUM_BITS = 16
+
+    def __init__(self, n=2):
+        """initialize attributes.
+
+        :param n: characters of n-gram
+        """
+        self.n = n
+        self._postings = {}  # n-gram: array of packed keys
+        self._positions = {}  # n-gram: array of positions in message
+        self._chars = {}  # character: set of n-grams, for short terms
+        self._threads = []  # thread id: (board url, dat)
+        self._thread_ids = {}  # (board url, dat): thread id
+        self._indexed = []  # thread id: max indexed response number
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.search.TextIndex({} threads)>'.format(
+            len(self._threads))
+
+    def add(self, thread, response):
+        """Index browser.Response of browser.Thread.
+
+        responses already indexed are ignored.
+        """
+        key = (thread.board_url, thread.dat)
+        thread_id = self._thread_ids.get(key)
+        if thread_id is None:
+            thread_id = len(self._threads)
+            self._threads.append(key)
+            self._thread_ids[key] = thread_id
+            self._indexed.append(0)
+        if response.num <= self._indexed[thread_id]:
+            return
+        if response.num >= 1 << self.NUM_BITS:
+            raise ValueError('response number is too large')
+        self._indexed[thread_id] = response.num
+        packed = thread_id << self.NUM_BITS | response.num
+        text = normalize(message_text(response.message))
+        for position in range(max(1, len(text) - self.n + 1)):
+            gram = text[position:position + self.n]
+            if not gram:
+                break
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array.array('L')
+                self._positions[gram] = array.array('I')
+                self._add_chars(gram)
+            postings.append(packed)
+            self._positions[gram].append(position)
+
+    def indexed(self, thread):
+        """Yield responses of thread and index them."""
+        for response in thread:
+            self.add(thread, response)
+            yield response
+
+    def search(self, query):
+        """Return keys of responses matching all terms of query.
+
+        terms are separated by spaces, "quoted text" is one term.
+        a term matches if normalized message text contains the term.
+
+        :rtype: sorted (board url, dat, response number) list
+        """
+        matched = None
+        for phrase, word in RE_QUERY.findall(query):
+            term = normalize(phrase or word)
+            if not term:
+                continue
+            found = self._term(term)
+            matched = found if matched is None else matched & found
+            if not matched:
+                return []
+        if not matched:
+            return []
+        mask = (1 << self.NUM_BITS) - 1
+        return [self._threads[packed >> self.NUM_BITS] + (packed & mask,)
+                for packed in sorted(matched)]
+
+    def _term(self, term):
+        """Return packed keys of messages containing normalized term."""
+        if len(term) < self.n:
+            found = set()
+            for gram in self._chars.get(term[0], ()):
+                if term in gram:
+                    found.update(self._postings[gram])
+            return found
+        starts = None  # (packed key, start position of term)
+        for offset in range(len(term) - self.n + 1):
+            gram = term[offset:offset + self.n]
+            if gram not in self._postings:
+                return set()
+            found = set(zip(self._postings[gram],
+                            [i - offset for i in self._positions[gram]]))
+            starts = found if starts is None else starts & found
+            if not starts:
+                return set()
+        return set(packed for packed, start in starts)
+
+    def verify(self, query, message):
+        """Return True if message contains all terms of query."""
+        text = normalize(message_text(message))
+        return all(normalize(phrase or word) in text
+                   for phrase, word in RE_QUERY.findall(query))
+
+    def save(self, path):
+        """Write index to file."""
+        grams = list(self._postings)
+        with open(path, 'wb') as f:
+            marshal.dump((self.n, self._threads, self._indexed, grams,
+                          [len(self._postings[i]) for i in grams]), f)
+            for gram in grams:
+                self._postings[gram].tofile(f)
+            for gram in grams:
+                self._positions[gram].tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Return index read from file."""
+        with open(path, 'rb') as f:
+            n, threads, indexed, grams, lengths = marshal.load(f)
+            postings = array.array('L')
+            postings.fromfile(f, sum(lengths))
+            positions = array.array('I')
+            positions.fromfile(f, sum(lengths))
+        index = cls(n)
+        index._threads = threads
+        index._thread_ids = dict((k, i) for i, k in enumerate(threads))
+        index._indexed = indexed
+        start = 0
+        for gram, length in zip(grams, lengths):
+            index._postings[gram] = postings[start:start + length]
+            index._positions[gram] = positions[start:start + length]
+            index._add_chars(gram)
+            start = start + length
+        return index
+
+    def _add_chars(self, gram):
+        for char in set(gram):
+            self._chars.setdefault(char, set()).add(gram)
@@ -0,0 +1,394 @@
+# coding: utf8
+"""local 2ch stand-in http server for tests and benchmarks.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import BaseHTTPServer
+import collections
+import email.utils
+import random
+import socket
+import SocketServer
+import sys
+import threading
+import time
+import urlparse
+
+from bbs2ch import synthetic
+
+MAX_RESPONSES = 1000
+
+
+class Server(object):
+
+    """Local 2ch stand-in http server.
+
+    serves /bbsmenu.html, /<board>/subject.txt, /<board>/dat/<dat>.dat
+    and /test/bbs.cgi of synthetic boards. any board name is valid.
+    threads grow by growth responses per second up to 1000.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0,
+                 categories=4, boards=5, threads=50, responses=100,
+                 growth=0.0, latency=0.0, failure_rate=0.0,
+                 failure_status=503, seed=0, clock=time.time):
+        """initialize attributes.
+
+        :param host: address to listen
+        :param port: port to listen, 0 picks a free port
+        :param categories: number of bbsmenu categories
+        :param boards: number of boards per category
+        :param threads: number of threads per board
+        :param responses: max initial responses per thread
+        :param growth: new responses per second per thread
+        :param latency: seconds to wait before each response
+        :param failure_rate: probability of failed request
+        :param failure_status: status of failed request,
+                               None closes connection without response
+        :param seed: random seed of synthetic data
+        :param clock: function returns current time
+        """
+        self.categories = categories
+        self.boards = boards
+        self.threads = threads
+        self.responses = responses
+        self.growth = growth
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.seed = seed
+        self.clock = clock
+        self.started = clock()
+        self.statuses = collections.Counter()  # status: count
+        self.connections = 0  # accepted connection count
+        self._random = random.Random(seed)
+        self._boards = {}  # name: {dat: _Thread}
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.bbs = self
+        self._serving = None
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.server.Server({})>'.format(repr(self.url))
+
+    @property
+    def host(self):
+        """Return 'hostname:port' of server."""
+        return '{}:{}'.format(*self._httpd.server_address[:2])
+
+    @property
+    def url(self):
+        """Return bbsmenu url."""
+        return u'http://{}/bbsmenu.html'.format(self.host)
+
+    def board_url(self, name):
+        """Return board url."""
+        return u'http://{}/{}/'.format(self.host, name)
+
+    def start(self):
+        """Start serving in background thread."""
+        self._serving = threading.Thread(target=self._httpd.serve_forever,
+                                         args=(0.05,))
+        self._serving.daemon = True
+        self._serving.start()
+
+    def stop(self):
+        """Stop serving and close listening socket."""
+        if self._serving:
+            self._httpd.shutdown()
+            self._serving.join()
+            self._serving = None
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        """Serve in current thread."""
+        self._httpd.serve_forever()
+
+    def menu(self):
+        """Return bbsmenu.html body and last modified time."""
+        return (synthetic.menu(self.categories, self.boards, self.host,
+                               self.seed),
+                self.started)
+
+    def subject(self, board):
+        """Return subject.txt body and last modified time."""
+        with self._lock:
+            threads = self._board(board).values()
+            for thread in threads:
+                self._grow(thread)
+        threads.sort(key=lambda thread: (thread.modified, int(thread.dat)),
+                     reverse=True)
+        body = u''.join(u'{}.dat<>{} ({})\n'.format(
+            i.dat, i.title, len(i.lines)) for i in threads)
+        modified = max(i.modified for i in threads) if threads else 0
+        return body.encode('ms932'), modified
+
+    def dat(self, board, dat):
+        """Return dat body and last modified time or None."""
+        with self._lock:
+            thread = self._board(board).get(dat)
+            if thread is None:
+                return None
+            self._grow(thread)
+            return ''.join(thread.lines), thread.modified
+
+    def write(self, board, dat, name, mail, message):
+        """Append response to thread.
+
+        :rtype: True if thread exists and is not full
+        """
+        with self._lock:
+            thread = self._board(board).get(dat)
+            if thread is None:
+                return False
+            self._grow(thread)
+            if len(thread.lines) >= MAX_RESPONSES:
+                return False
+            now = self.clock()
+            tm = time.gmtime(now + 9 * 3600)
+            date = u'{:04d}/{:02d}/{:02d}({}) {:02d}:{:02d}:{:02d}.00'.format(
+                tm.tm_year, tm.tm_mon, tm.tm_mday,
+                synthetic.WEEKDAYS[tm.tm_wday],
+                tm.tm_hour, tm.tm_min, tm.tm_sec)
+            line = u'{}<>{}<>{} ID:local<> {} <>\n'.format(
+                name or synthetic.NAMES[0], mail, date,
+                message.replace(u'\n', u' <br> '))
+            thread.lines.append(line.encode('ms932', 'replace'))
+            thread.modified = now
+            return True
+
+    def fail(self):
+        """Return True if this request should fail."""
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def _board(self, name):
+        board = self._boards.get(name)
+        if board is None:
+            rand = random.Random(u'{}/{}'.format(self.seed, name))
+            board = {}
+            created = int(self.started)
+            for i in range(self.threads):
+                dat = str(created - i * 600 - rand.randint(0, 599))
+                title = u' '.join(rand.choice(synthetic.WORDS)
+                                  for _ in range(rand.randint(2, 6)))
+                board[dat] = _Thread(
+                    dat, title, rand.randint(1, self.responses), self.started)
+            self._boards[name] = board
+        return board
+
+    def _grow(self, thread):
+        now = self.clock()
+        size = min(MAX_RESPONSES,
+                   thread.initial + int((now - self.started) * self.growth))
+        if len(thread.lines) < size:
+            if thread.lines:
+                thread.modified = now
+            thread.lines.extend(
+                synthetic.dat_line(num, int(thread.dat), thread.title,
+                                   self.seed)
+                for num in range(len(thread.lines) + 1, size + 1))
+
+
+class _Thread(object):
+
+    """Thread state of Server."""
+
+    __slots__ = ('dat', 'title', 'initial', 'lines', 'modified')
+
+    def __init__(self, dat, title, initial, modified):
+        self.dat = dat
+        self.title = title
+        self.initial = initial
+        self.lines = []
+        self.modified = modified
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    """Keep-alive request handler of Server."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'bbs2ch-local'
+    wbufsize = -1  # send header and body at once, flushed by _send
+
+    def log_message(self, format, *args):
+        pass
+
+    def parse_request(self):
+        # ignore empty lines before request line as RFC 7230 section 3.5
+        while self.raw_requestline in ('\r\n', '\n'):
+            self.raw_requestline = self.rfile.readline(65537)
+        return BaseHTTPServer.BaseHTTPRequestHandler.parse_request(self)
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # keep-alive responses must not wait for delayed ack
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.bbs._lock:
+            self.server.bbs.connections += 1
+
+    def do_GET(self):
+        bbs = self.server.bbs
+        if not self._begin():
+            return
+        path = urlparse.urlsplit(self.path).path
+        parts = path.strip('/').split('/')
+        if path == '/bbsmenu.html':
+            body, modified = bbs.menu()
+            self._content(body, modified, 'text/html')
+        elif len(parts) == 2 and parts[1] == 'subject.txt':
+            body, modified = bbs.subject(parts[0])
+            self._content(body, modified, 'text/plain')
+        elif (len(parts) == 3 and parts[1] == 'dat' and
+                parts[2].endswith('.dat')):
+            found = bbs.dat(parts[0], parts[2][:-4])
+            if found is None:
+                self._status(404, '')
+            else:
+                self._content(found[0], found[1], 'text/plain')
+        else:
+            self._status(404, '')
+
+    def do_POST(self):
+        bbs = self.server.bbs
+        length = int(self.headers.getheader('Content-Length') or 0)
+        form = urlparse.parse_qs(self.rfile.read(length))
+        if not self._begin():
+            return
+        if urlparse.urlsplit(self.path).path != '/test/bbs.cgi':
+            self._status(404, '')
+            return
+
+        def field(key):
+            return form.get(key, [''])[0].decode('ms932', 'replace')
+        written = bbs.write(field('bbs'), field('key'), field('FROM'),
+                            field('mail'), field('MESSAGE'))
+        status = 'true' if written else 'error'
+        title = u'書きこみました。' if written else u'ＥＲＲＯＲ！'
+        body = (u'<html><head><meta http-equiv="Content-Type" '
+                u'content="text/html; charset=Shift_JIS">'
+                u'<title>{}</title></head>'
+                u'<body><!-- 2ch_X:{} -->{}</body></html>').format(
+                    title, status, title).encode('ms932')
+        self._send(200, body, [('Content-Type',
+                                'text/html; charset=Shift_JIS')])
+
+    def _begin(self):
+        """Wait latency and inject failure, return False if failed."""
+        bbs = self.server.bbs
+        if bbs.latency:
+            time.sleep(bbs.latency)
+        if bbs.fail():
+            if bbs.failure_status is None:
+                bbs.statuses[None] += 1
+                self.close_connection = 1
+            else:
+                self._status(bbs.failure_status, '')
+            return False
+        return True
+
+    def _content(self, body, modified, content_type):
+        """Send body with If-Modified-Since, Range and gzip support."""
+        header = [('Content-Type', content_type + '; charset=Shift_JIS'),
+                  ('Last-Modified', email.utils.formatdate(modified,
+                                                           usegmt=True))]
+        since = self.headers.getheader('If-Modified-Since')
+        if since:
+            parsed = email.utils.parsedate_tz(since)
+            if parsed and int(modified) <= email.utils.mktime_tz(parsed):
+                self._send(304, '', header)
+                return
+        ranged = self.headers.getheader('Range')
+        if ranged and ranged.startswith('bytes=') and ranged.endswith('-'):
+            start = ranged[6:-1]
+            if start.isdigit():
+                start = int(start)
+                if start >= len(body):
+                    header.append(('Content-Range',
+                                   'bytes */{}'.format(len(body))))
+                    self._send(416, '', header)
+                    return
+                header.append(('Content-Range', 'bytes {}-{}/{}'.format(
+                    start, len(body) - 1, len(body))))
+                self._send(206, body[start:], header)
+                return
+        if 'gzip' in (self.headers.getheader('Accept-Encoding') or ''):
+            header.append(('Content-Encoding', 'gzip'))
+            body = synthetic.gzip(body)
+        self._send(200, body, header)
+
+    def _status(self, status, body):
+        self._send(status, body, [('Content-Type', 'text/plain')])
+
+    def _send(self, status, body, header):
+        self.server.bbs.statuses[status] += 1
+        self.send_response(status)
+        for key, value in header:
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+
+def main(argv=None):
+    """Run server from command line."""
+    import argparse
+    parser = argparse.ArgumentParser(description='local 2ch stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--responses', type=int, default=100)
+    parser.add_argument('--growth', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+    server = Server(args.host, args.port, threads=args.threads,
+                    responses=args.responses, growth=args.growth,
+                    latency=args.latency, failure_rate=args.failure_rate)
+    print 'serving', server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""local dat store.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import array
+import mmap
+import os
+
+from bbs2ch import http
+
+
+class DatStore(object):
+
+    """Local store of raw thread dat files.
+
+    raw dat is saved as <directory>/<host>/<board>/<dat>.dat and
+    end offsets of lines as <dat>.idx.
+    """
+
+    def __init__(self, directory):
+        """initialize attributes."""
+        self.directory = directory
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.store.DatStore({})>'.format(repr(self.directory))
+
+    def path(self, board_url, dat):
+        """Return dat file path without extension."""
+        host, path = http.host_path(board_url)
+        return os.path.join(self.directory, host.replace(':', '_'),
+                            *(path.strip('/').split('/') + [dat]))
+
+    def open(self, board_url, dat):
+        """Return DatFile object."""
+        return DatFile(self.path(board_url, dat))
+
+
+class DatFile(object):
+
+    """Append only raw dat file with line offset index."""
+
+    def __init__(self, path):
+        """initialize attributes and load line offset index."""
+        self.path = path
+        self.offsets = array.array('I')  # end offset of each line
+        self._dat = None
+        self._idx = None
+        self._map = None
+        self._map_size = 0
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx', 'rb') as f:
+                data = f.read()
+            self.offsets.fromstring(
+                data[:len(data) - len(data) % self.offsets.itemsize])
+        size = 0
+        if os.path.exists(path + '.dat'):
+            size = os.path.getsize(path + '.dat')
+        if self.size != size:
+            self._repair(size)
+
+    def __repr__(self):
+        """Return repr(self) string."""
+        return '<bbs2ch.store.DatFile({})>'.format(repr(self.path))
+
+    def __len__(self):
+        """Return line count."""
+        return len(self.offsets)
+
+    @property
+    def size(self):
+        """Return raw dat size."""
+        return self.offsets[-1] if self.offsets else 0
+
+    def line(self, num):
+        """Return raw line string without newline.
+
+        :param num: 1 origin line number
+        """
+        if not 0 < num <= len(self.offsets):
+            raise IndexError(num)
+        self.flush()
+        data = self._mapped()
+        start = self.offsets[num - 2] if num > 1 else 0
+        return data[start:self.offsets[num - 1] - 1]
+
+    def iter_lines(self, start=1):
+        """Yield raw line strings from start line number."""
+        for num in range(start, len(self.offsets) + 1):
+            yield self.line(num)
+
+    def append(self, line):
+        """Append a raw line string without newline."""
+        if self._dat is None:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._dat = open(self.path + '.dat', 'ab')
+            self._idx = open(self.path + '.idx', 'ab')
+        self._dat.write(line + '\n')
+        self.offsets.append(self.size + len(line) + 1)
+        self._idx.write(self.offsets[-1:].tostring())
+
+    def flush(self):
+        """Write appended lines to disk."""
+        # dat is flushed first so the index never points past dat
+        if self._dat is not None:
+            self._dat.flush()
+            self._idx.flush()
+
+    def truncate(self):
+        """Remove all lines."""
+        self.close()
+        for ext in ('.dat', '.idx'):
+            if os.path.exists(self.path + ext):
+                os.remove(self.path + ext)
+        self.offsets = array.array('I')
+
+    def close(self):
+        """Close opened files."""
+        self.flush()
+        for f in (self._dat, self._idx, self._map):
+            if f is not None:
+                f.close()
+        self._dat = None
+        self._idx = None
+        self._map = None
+        self._map_size = 0
+
+    def _repair(self, size):
+        """Rebuild line offset index from dat.
+
+        dat is the source of truth, only a line written partially by
+        interrupted append is dropped.
+        """
+        self.offsets = array.array('I')
+        if size:
+            with open(self.path + '.dat', 'rb') as f:
+                data = f.read()
+            end = data.find('\n')
+            while end >= 0:
+                self.offsets.append(end + 1)
+                end = data.find('\n', end + 1)
+        if not self.offsets:
+            self.truncate()
+            return
+        if self.size != size:
+            with open(self.path + '.dat', 'r+b') as f:
+                f.truncate(self.size)
+        with open(self.path + '.idx', 'wb') as f:
+            f.write(self.offsets.tostring())
+
+    def _mapped(self):
+        if self._map is None or self._map_size < self.size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path + '.dat', 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_size = self.size
+        return self._map
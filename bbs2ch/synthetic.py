@@ -0,0 +1,142 @@
+# coding: utf8
+"""synthetic 2ch data for tests and benchmarks.
+
+Copyright (c) 2011-2014 mei raka
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL mei raka BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import random
+import time
+import zlib
+
+HOST = u'test2ch.net'
+NAMES = (u'名無しさん', u'名無しさん@お腹いっぱい。',
+         u'以下、名無しにかわりましてVIPがお送りします', u'◆abcdEFGH12')
+MAILS = (u'', u'', u'sage', u'sage', u'age')
+WORDS = (u'テスト', u'それな', u'草', u'ワロタ', u'まじか', u'本当に', u'スレ',
+         u'立て乙', u'なんでや', u'ほんこれ', u'これは', u'ひどい', u'今北産業', u'kwsk',
+         u'http://example.com/', u'ttp://example.jp/a.jpg', u'2ch', u'abc',
+         u'ー', u'。', u'、', u'？', u'！')
+WEEKDAYS = u'月火水木金土日'
+
+
+def menu(categories=40, boards=20, host=HOST, seed=0):
+    """return synthetic bbsmenu.html body.
+
+    :param categories: number of categories
+    :param boards: number of boards per category
+    :rtype: ms932 encoded string
+    """
+    rand = random.Random(seed)
+    lines = [u'<HTML><HEAD><META http-equiv="Content-Type" '
+             u'content="text/html; charset=Shift_JIS"><TITLE>BBS MENU'
+             u'</TITLE></HEAD><BODY><BR><BR>']
+    for c in range(categories):
+        lines.append(u'<BR><BR><B>カテゴリ{}</B><BR>'.format(c))
+        for b in range(boards):
+            lines.append(u'<A HREF=http://{}/b{}x{}/>{}板{}</A><br>'.format(
+                host, c, b, rand.choice(WORDS), b))
+    lines.append(u'</BODY></HTML>')
+    return u'\n'.join(lines).encode('ms932')
+
+
+def subject(threads=800, now=1424649600, seed=0):
+    """return synthetic subject.txt body.
+
+    :param threads: number of threads
+    :param now: newest dat key
+    :rtype: ms932 encoded string
+    """
+    rand = random.Random(seed)
+    lines = []
+    for i in range(threads):
+        dat = now - i * 600 - rand.randint(0, 599)
+        title = u' '.join(
+            rand.choice(WORDS) for _ in range(rand.randint(2, 6)))
+        lines.append(u'{}.dat<>{} Part{} ({})\n'.format(
+            dat, title, i, rand.randint(1, 1000)))
+    return u''.join(lines).encode('ms932')
+
+
+def dat_line(num, created=1424649600, title=u'', seed=0):
+    """return synthetic dat line of response num.
+
+    :param num: response number starting from 1
+    :param created: time of response 1
+    :param title: thread title, written only in the first line
+    :rtype: ms932 encoded string with newline
+    """
+    rand = random.Random(seed * 1000003 + num)
+    posted = created + num * 37 + rand.randint(0, 36)
+    tm = time.gmtime(posted + 9 * 3600)
+    date_id = u'{:04d}/{:02d}/{:02d}({}) {:02d}:{:02d}:{:02d}.{:02d} ID:{}'
+    date_id = date_id.format(
+        tm.tm_year, tm.tm_mon, tm.tm_mday, WEEKDAYS[tm.tm_wday],
+        tm.tm_hour, tm.tm_min, tm.tm_sec, rand.randint(0, 99),
+        u'ID{:06d}'.format(rand.randint(0, 50)))
+    words = []
+    if num > 1 and rand.random() < 0.3:
+        words.append(u'&gt;&gt;{}<br>'.format(rand.randint(1, num - 1)))
+    for _ in range(rand.randint(1, 40)):
+        words.append(rand.choice(WORDS))
+        if rand.random() < 0.1:
+            words.append(u' <br> ')
+    return u'{}<>{}<>{}<> {} <>{}\n'.format(
+        rand.choice(NAMES), rand.choice(MAILS), date_id, u''.join(words),
+        title if num == 1 else u'').encode('ms932')
+
+
+def dat(responses=1000, created=1424649600, title=u'スレッド', seed=0):
+    """return synthetic thread dat body.
+
+    :param responses: number of responses
+    :rtype: ms932 encoded string
+    """
+    return ''.join(dat_line(num, created, title, seed)
+                   for num in range(1, responses + 1))
+
+
+def gzip(body, level=6):
+    """return gzip compressed body."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def response(body, status='200 OK', content_type='text/plain',
+             charset='Shift_JIS', gzipped=False, header=()):
+    """return raw http response of body.
+
+    :param header: extra header name, value pairs
+    :rtype: string
+    """
+    if gzipped:
+        body = gzip(body)
+    lines = ['HTTP/1.1 ' + status,
+             'Content-Type: {}; charset={}'.format(content_type, charset),
+             'Content-Length: {}'.format(len(body))]
+    if gzipped:
+        lines.append('Content-Encoding: gzip')
+    lines.extend('{}: {}'.format(k, v) for k, v in header)
+    return '\r\n'.join(lines) + '\r\n\r\n' + body
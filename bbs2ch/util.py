@@ -1,6 +1,5 @@
 #coding:utf8
-import re
-import browsing
+from bbs2ch import links
 
 """
 util functions for bbs2ch.
@@ -49,19 +48,10 @@ def check_code(string):
 
 def extract_url(text):
     """ Returns url list extract from given text.
+
+    for many messages, see links.thread_links.
     """
-    urls = []
-    end = 0
-    url_regex = re.compile(u'(h?)(ttp|ttps)(://[^\\s|^<]+)')
-    while True:
-        match = url_regex.search(text[end:])
-        if match:
-            f = match.groups()
-            urls.append('h'+f[1]+f[2])
-            end = end + match.end()-1
-        else:
-            break
-    return urls
+    return links.urls(text)
 
 def get_be_id(be_number):
     """Returns 2ch be basic number.
@@ -70,31 +60,9 @@ def get_be_id(be_number):
     beid = ((benum/100) + ((benum/10) % 10) - (benum % 10) - 5) / (((benum/10) % 10) * (benum % 10) * 3)
     return str(beid)
 
-def search_next_thread(thread):
-    parent_board = thread.parent
-    title = thread.title
-    search_text_list= []
-    text_length = 16
-    while True:
-        if text_length <= 0:
-            return []
-        if len(title) > text_length-1:
-            for index in range(len(title)-text_length):
-                search_text_list.append(title[index:index+text_length])
-        else:
-                search_text_list = [title]
-        match_thread_list = []
-        for next_thread_candidate in parent_board:
-            if not next_thread_candidate.rank == 10000:
-                for search_text in search_text_list:
-                    if next_thread_candidate == thread:
-                        break
-                    if next_thread_candidate.title.count(search_text):
-                        match_thread_list.append(next_thread_candidate)
-                        break
-        if match_thread_list:
-            return match_thread_list
-        else:
-            text_length = text_length - 4
-
+def search_next_thread(thread, board):
+    """Returns next thread candidates of thread from board.
 
+    uses title index of board, updated when board is fetched.
+    """
+    return [candidate for score, candidate in board.titles.next_thread(thread)]
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+# coding: utf8
+"""benchmark fetch path of browser classes against local server.
+
+usage: python benchmarks/fetch.py [-o result.json] [--latency 0.01]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from bbs2ch import browser
+from bbs2ch import http
+from bbs2ch import server
+
+
+def crawl(boards):
+    """Fetch all threads of boards, return latency list and bytes.
+
+    threads fetched before are fetched differentially.
+    """
+    latencies = []
+    size = 0
+    for board in boards:
+        start = time.time()
+        threads = list(board)
+        latencies.append(time.time() - start)
+        for thread in threads:
+            fetched = thread.bytes
+            start = time.time()
+            list(thread)
+            latencies.append(time.time() - start)
+            size += thread.bytes - fetched
+    return latencies, size
+
+
+class Stages(object):
+
+    """http hook sums seconds of each request stage."""
+
+    KEYS = {u'connect': (u'dns', u'connect'),
+            u'response': (u'send', u'first_byte', u'transfer',
+                          u'decompress'),
+            u'decompress': (u'seconds',),
+            u'charset': (u'seconds',),
+            u'parse': (u'seconds',)}
+
+    def __init__(self):
+        self.seconds = {}
+
+    def __call__(self, event, info):
+        for key in self.KEYS.get(event, ()):
+            name = event if key == u'seconds' else key
+            if event == u'parse':
+                name = u'parse ' + info[u'kind']
+            self.seconds[name] = self.seconds.get(name, 0.0) + (
+                info[key] or 0.0)
+
+
+def summary(latencies, size, seconds):
+    """Return throughput and latency percentiles dict."""
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    return {u'requests': len(latencies),
+            u'seconds': seconds,
+            u'requests_per_s': len(latencies) / seconds,
+            u'mb_per_s': size / seconds / 1e6,
+            u'latency_p50_ms': percentile(0.5) * 1000,
+            u'latency_p90_ms': percentile(0.9) * 1000,
+            u'latency_p99_ms': percentile(0.99) * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help='save results as json')
+    parser.add_argument('--boards', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--responses', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    bbs = server.Server(threads=args.threads, responses=args.responses,
+                        growth=1.0, latency=args.latency)
+    bbs.start()
+    names = [u'bench{}'.format(i) for i in range(args.boards)]
+    results = {}
+    try:
+        # generate server side data before measuring
+        crawl([browser.Board(bbs.board_url(i)) for i in names])
+        for name, pool in [('full close', None),
+                           ('full keep-alive', http.ConnectionPool()),
+                           ('differential keep-alive',
+                            http.ConnectionPool())]:
+            boards = [browser.Board(bbs.board_url(i), pool=pool)
+                      for i in names]
+            if name.startswith('differential'):
+                crawl(boards)
+                time.sleep(1)
+            connections = bbs.connections
+            stages = Stages()
+            http.hooks.append(stages)
+            start = time.time()
+            latencies, size = crawl(boards)
+            result = summary(latencies, size, time.time() - start)
+            http.hooks.remove(stages)
+            result[u'connections'] = bbs.connections - connections
+            result[u'stages'] = stages.seconds
+            results[name] = result
+            if pool:
+                pool.close()
+            print ('{:24} {requests:6d} req {requests_per_s:8.1f} req/s '
+                   'p50 {latency_p50_ms:7.2f} ms p99 {latency_p99_ms:7.2f} ms '
+                   '{connections:4d} conn').format(name, **result)
+            print '    ' + ', '.join('{} {:.1f} ms'.format(k, v * 1000) for k, v
+                                     in sorted(result[u'stages'].items()))
+    finally:
+        bbs.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({u'time': time.time(),
+                       u'python': platform.python_version(),
+                       u'platform': platform.platform(),
+                       u'arguments': vars(args),
+                       u'results': results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
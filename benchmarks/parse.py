@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# coding: utf8
+"""benchmark bbs2ch parsers and browser iterators on synthetic data.
+
+usage: python benchmarks/parse.py [-o result.json] [-c previous.json]
+
+every case runs in a forked process to measure its peak memory.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from bbs2ch import browser
+from bbs2ch import decode
+from bbs2ch import http
+from bbs2ch import synthetic
+
+
+class _Connection(object):
+
+    """Socket like object returns a canned response."""
+
+    def __init__(self, response):
+        self.response = response
+        self.pos = 0
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, request):
+        pass
+
+    def recv_into(self, view, size):
+        data = self.response[self.pos:self.pos + size]
+        self.pos += len(data)
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def _serve(response):
+    """Make http connections return response."""
+    http._connect = lambda host, port, timeout: _Connection(response)
+
+
+def cases(args):
+    """Return benchmark name, function, input bytes, items list."""
+    menu = synthetic.menu(args.categories, args.boards)
+    subject = synthetic.subject(args.threads)
+    dat = synthetic.dat(args.responses)
+    menu_response = synthetic.response(menu, content_type='text/html')
+    subject_response = synthetic.response(subject, gzipped=True)
+    dat_response = synthetic.response(dat)
+    dat_gzip_response = synthetic.response(dat, gzipped=True)
+    boards = args.categories * args.boards
+    board_url = u'http://{}/b0x0/'.format(synthetic.HOST)
+
+    def thread():
+        return list(browser.Thread(board_url, u'1424649600'))
+
+    def board():
+        return list(browser.Board(board_url))
+
+    def menu_():
+        return list(browser.Menu(
+            u'http://{}/bbsmenu.html'.format(synthetic.HOST)))
+
+    return [
+        ('decode.menu', lambda: list(decode.menu(menu.decode('ms932'))),
+         len(menu), boards, None),
+        ('decode.menu_bytes', lambda: list(decode.menu_bytes(menu)),
+         len(menu), boards, None),
+        ('decode.board_subject',
+         lambda: list(decode.board_subject(subject.decode('ms932'))),
+         len(subject), args.threads, None),
+        ('decode.board_subject_bytes',
+         lambda: list(decode.board_subject_bytes(subject)),
+         len(subject), args.threads, None),
+        ('decode.thread_dat',
+         lambda: list(decode.thread_dat(dat.decode('ms932'))),
+         len(dat), args.responses, None),
+        ('decode.thread_dat_bytes',
+         lambda: list(decode.thread_dat_bytes(dat)),
+         len(dat), args.responses, None),
+        ('http.decode_response dat',
+         lambda: http.decode_response(dat_response),
+         len(dat_response), args.responses, None),
+        ('http.decode_response dat gzip',
+         lambda: http.decode_response(dat_gzip_response),
+         len(dat_gzip_response), args.responses, None),
+        ('browser.Menu', menu_,
+         len(menu_response), boards, menu_response),
+        ('browser.Board gzip', board,
+         len(subject_response), args.threads, subject_response),
+        ('browser.Thread', thread,
+         len(dat_response), args.responses, dat_response),
+        ('browser.Thread gzip', thread,
+         len(dat_gzip_response), args.responses, dat_gzip_response),
+        ('browser.Thread messages',
+         lambda: [i.message for i in thread()],
+         len(dat_response), args.responses, dat_response),
+    ]
+
+
+def measure(func, size, items, response, repeat, number):
+    """Return timings and peak memory of func."""
+    if response is not None:
+        _serve(response)
+    func()  # warm up
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    seconds = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {u'seconds': seconds,
+            u'bytes': size,
+            u'items': items,
+            u'mb_per_s': size / seconds / 1e6,
+            u'items_per_s': items / seconds,
+            u'peak_rss_kb': peak,
+            u'peak_rss_growth_kb': peak - base}
+
+
+def measure_forked(*args):
+    """Run measure in child process, isolated peak memory."""
+    if not hasattr(os, 'fork'):
+        return measure(*args)
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        try:
+            result = json.dumps(measure(*args))
+        except Exception as e:
+            result = json.dumps({u'error': repr(e)})
+        with os.fdopen(write, 'w') as f:
+            f.write(result)
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help='save results as json')
+    parser.add_argument('-c', '--compare', help='compare with results json')
+    parser.add_argument('-k', '--keyword', default='',
+                        help='run cases containing keyword only')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=10)
+    parser.add_argument('--categories', type=int, default=40)
+    parser.add_argument('--boards', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=800)
+    parser.add_argument('--responses', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)[u'results']
+
+    results = {}
+    print '{:32} {:>10} {:>9} {:>12} {:>9} {:>8}'.format(
+        'case', 'ms', 'MB/s', 'items/s', 'peak KB', 'vs prev')
+    for name, func, size, items, response in cases(args):
+        if args.keyword not in name:
+            continue
+        result = measure_forked(func, size, items, response,
+                                args.repeat, args.number)
+        results[name] = result
+        if u'error' in result:
+            print '{:32} {}'.format(name, result[u'error'])
+            continue
+        ratio = ''
+        if name in previous and u'seconds' in previous[name]:
+            ratio = '{:.2f}x'.format(
+                previous[name][u'seconds'] / result[u'seconds'])
+        print '{:32} {:10.3f} {:9.1f} {:12.0f} {:9d} {:>8}'.format(
+            name, result[u'seconds'] * 1000, result[u'mb_per_s'],
+            result[u'items_per_s'], result[u'peak_rss_kb'], ratio)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({u'time': time.time(),
+                       u'python': platform.python_version(),
+                       u'implementation': platform.python_implementation(),
+                       u'platform': platform.platform(),
+                       u'arguments': vars(args),
+                       u'results': results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
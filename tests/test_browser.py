@@ -0,0 +1,201 @@
+# coding: utf8
+"""Test bbs2ch.browser module."""
+from bbs2ch import browser
+from bbs2ch import http
+
+
+class _Connection(object):
+
+    """Socket like object returns a canned response."""
+
+    def __init__(self, response, requests):
+        self.response = response
+        self.requests = requests
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, request):
+        self.requests.append(request)
+
+    def recv_into(self, view, size):
+        data = self.response[:size]
+        self.response = self.response[len(data):]
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def _connect(monkeypatch, responses):
+    """Make http connections return responses in order.
+
+    :rtype: sent request list
+    """
+    requests = []
+    monkeypatch.setattr(
+        http, '_connect',
+        lambda host, port, timeout: _Connection(responses.pop(0), requests))
+    return requests
+
+
+DAT = (u'名無し<><>2015/02/23(月) 00:00:00.00 ID:AAAAAAAA<>1<>スレ\n'
+       u'名無し<><>2015/02/23(月) 00:00:01.00 ID:BBBBBBBB<>2<>\n'
+       ).encode('ms932')
+DAT_NEW = u'名無し<><>2015/02/23(月) 00:00:02.00 ID:CCCCCCCC<>3<>\n'.encode(
+    'ms932')
+
+
+def _response(status, body, header=''):
+    return ('HTTP/1.1 {}\r\n{}Content-Length: {}\r\n\r\n{}'.format(
+        status, header, len(body), body))
+
+
+def test_thread_differential(monkeypatch):
+    """Request only new responses with Range header."""
+    requests = _connect(monkeypatch, [
+        _response('200 OK', DAT, 'Last-Modified: a\r\n'),
+        _response('206 Partial Content', '\n' + DAT_NEW,
+                  'Last-Modified: b\r\n'),
+        _response('304 Not Modified', '')])
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100')
+    assert [1, 2] == [i.num for i in thread]
+    assert len(DAT) == thread.bytes
+    thread = browser.Thread(**thread.dump())
+    assert [(3, u'3')] == [(i.num, i.message) for i in thread]
+    assert 'Range: bytes={}-'.format(len(DAT) - 1) in requests[1]
+    assert 'If-Modified-Since: a' in requests[1]
+    assert len(DAT + DAT_NEW) == thread.bytes
+    assert [] == list(thread)
+    assert (3, 'b') == (thread.fetched, thread.list_if_modified_since)
+
+
+def test_thread_indexes(monkeypatch):
+    """Keep replies and columns only if indexes is set."""
+    _connect(monkeypatch, [
+        _response('200 OK', DAT),
+        _response('200 OK', DAT.replace('<>2<>', '<>&gt;&gt;1<>'))])
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100')
+    assert 2 == len(list(thread))
+    assert (None, None) == (thread.replies, thread.columns)
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100',
+                            indexes=True)
+    assert 2 == len(list(thread))
+    assert [2] == thread.replies.replies(1)
+    assert [1, 2] == list(thread.columns.nums)
+
+
+def test_thread_differential_broken(monkeypatch):
+    """Fetch all responses if the thread was replaced."""
+    _connect(monkeypatch, [
+        _response('206 Partial Content', 'x' + DAT_NEW),
+        _response('200 OK', DAT)])
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100',
+                            bytes=100, fetched=5)
+    assert [1, 2] == [i.num for i in thread]
+    assert (len(DAT), 2) == (thread.bytes, thread.fetched)
+
+
+def test_thread_store(monkeypatch, tmpdir):
+    """Return stored responses and request only new responses."""
+    from bbs2ch import store
+    requests = _connect(monkeypatch, [
+        _response('200 OK', DAT),
+        _response('206 Partial Content', '\n' + DAT_NEW)])
+    dat_store = store.DatStore(str(tmpdir))
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100',
+                            store=dat_store)
+    assert [1, 2] == [i.num for i in thread]
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100',
+                            store=dat_store)
+    assert [1, 2, 3] == [i.num for i in thread]
+    assert 'Range: bytes={}-'.format(len(DAT) - 1) in requests[1]
+    assert u'2' == thread.response(2).message
+
+
+def test_pipeline_truncated(monkeypatch):
+    """Request the rest of dat cut short by server."""
+    line = DAT.split('\n')[0] + '\n'
+    requests = _connect(monkeypatch, [
+        _response('200 OK', DAT) + _response('200 OK', DAT)[:-len(DAT) +
+                                                          len(line)],
+        _response('206 Partial Content', DAT[len(line) - 1:])])
+    threads = [browser.Thread(u'http://test2ch.net/hoge/', u'100'),
+               browser.Thread(u'http://test2ch.net/hoge/', u'200')]
+    assert [[1, 2], [1, 2]] == [
+        [i.num for i in responses]
+        for thread, responses in browser.pipeline(threads)]
+    assert 'Range: bytes={}-'.format(len(line) - 1) in requests[-1]
+    assert 2 == len(requests)
+
+
+def test_board_refresh(monkeypatch):
+    """Return changes of subject.txt and reuse Thread objects."""
+    _connect(monkeypatch, [
+        _response('200 OK', u'1.dat<>a (1)\n2.dat<>b (5)\n3.dat<>c (1)\n'
+                  .encode('ms932')),
+        _response('200 OK', u'2.dat<>b (6)\n1.dat<>a (1)\n4.dat<>d (1)\n'
+                  .encode('ms932')),
+        _response('304 Not Modified', '')])
+    board = browser.Board(u'http://test2ch.net/hoge/')
+    first = list(board)
+    assert [u'1', u'2', u'3'] == [i.dat for i in board.changes.new]
+    changes = board.refresh()
+    assert [u'4'] == [i.dat for i in changes.new]
+    assert [u'3'] == [i.dat for i in changes.removed]
+    assert [u'2'] == [i.dat for i in changes.count_changed]
+    assert [u'2', u'1'] == [i.dat for i in changes.rank_moved]
+    assert first[1] is board.threads[u'2']
+    assert [u'2', u'1', u'4'] == [i.dat for i in board]
+    assert not any(board.changes)
+
+
+def test_board_titles(monkeypatch):
+    """Index thread titles on first access and update them."""
+    _connect(monkeypatch, [
+        _response('200 OK', u'1.dat<>ほげスレ (1)\n2.dat<>ふが (5)\n'
+                  .encode('ms932')),
+        _response('200 OK', u'3.dat<>ほげスレ2 (1)\n2.dat<>ふが (6)\n'
+                  .encode('ms932'))])
+    board = browser.Board(u'http://test2ch.net/hoge/')
+    board.refresh()
+    assert board._titles is None
+    assert [u'1'] == [i.dat for score, i in board.titles.search(u'ほげ')]
+    board.refresh()
+    assert [u'3'] == [i.dat for score, i in board.titles.search(u'ほげ')]
+
+
+def test_thread_large_anchor(monkeypatch):
+    """Ignore anchors which can not be response numbers."""
+    _connect(monkeypatch, [_response('200 OK', (
+        u'名無し<><>2015/02/23(月) 00:00:00.00 ID:AAAAAAAA<>'
+        u'&gt;&gt;99999999999<>スレ\n').encode('ms932'))])
+    thread = browser.Thread(u'http://test2ch.net/hoge/', u'100')
+    assert [()] == [i.anchors for i in thread]
+
+
+def test_response_from_line():
+    """Decode fields of raw dat line on access."""
+    response = browser.Response.from_line(
+        1, u'名無し<>sage<>2015/02/23(月) 00:00:00.00 ID:AAAAAAAA<>'
+        u'&gt;&gt;1<>スレ'.encode('ms932'))
+    assert u'&gt;&gt;1' == response.message
+    assert (u'名無し', u'sage') == (response.name, response.mail)
+    assert (1,) == response.anchors
+    assert not hasattr(response, '__dict__')
+    assert None is browser.Response.from_line(2, '')
+
+
+def test_response_pickle():
+    """Pickle raw and decoded responses."""
+    import pickle
+    responses = [browser.Response.from_line(
+        1, u'名無し<><>date<>&gt;&gt;1<>'.encode('ms932')),
+        browser.Response(2, u'名無し', u'', u'date', u'本文')]
+    responses[0].message
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        loaded = pickle.loads(pickle.dumps(responses, protocol))
+        assert [(1, u'名無し', u'&gt;&gt;1', (1,)),
+                (2, u'名無し', u'本文', ())] == [
+            (i.num, i.name, i.message, i.anchors) for i in loaded]
@@ -0,0 +1,44 @@
+# coding: utf8
+"""Test bbs2ch.classify module."""
+from bbs2ch import browser
+from bbs2ch import classify
+
+
+def _response(num, message):
+    return browser.Response(num, u'', u'', u'', message)
+
+
+AA_MESSAGE = (u' 　 ∧＿∧ <br> 　（　´∀｀）  <br> 　（　　　　） <br> '
+              u'　｜ ｜　| <br> 　（_＿）＿） ')
+CODE_MESSAGE = (u' def hoge(): <br>     return 1 <br> '
+                u'int main() { <br>     return 0; <br> } ')
+
+
+def test_features():
+    """Count features of many messages at once."""
+    counts = classify.features([_response(1, AA_MESSAGE),
+                                _response(2, CODE_MESSAGE),
+                                _response(3, u' &gt;&gt;1 http://a.com/ ')])
+    assert [5, 5, 1] == counts[u'lines']
+    assert [0, 2, 0] == counts[u'indents']
+    assert [0, 3, 0] == counts[u'code_ends']
+    assert [0, 0, 1] == counts[u'urls']
+    assert [0, 0, 1] == counts[u'link_only']
+
+
+def test_thread_flags():
+    """Classify only new responses and find copies."""
+    flags = classify.ThreadFlags()
+    responses = [_response(1, AA_MESSAGE),
+                 _response(2, CODE_MESSAGE),
+                 _response(3, u' ttp://a.com/ <br> http://b.com/ '),
+                 _response(4, u' 普通の書き込みですよね '),
+                 _response(5, u' 普通の書き込みですよね　')]
+    assert [classify.AA, classify.CODE, classify.LINK_ONLY, 0] == list(
+        flags.add(responses[:4]))
+    assert [classify.COPY] == list(flags.add(responses))
+    assert [5] == flags.where(classify.COPY)
+    assert classify.CODE == flags.get(2)
+    assert 0 == flags.get(6)
+    other = classify.ThreadFlags(seen=flags._seen)
+    assert [classify.COPY] == list(other.add(responses[3:4]))
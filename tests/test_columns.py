@@ -0,0 +1,45 @@
+# coding: utf8
+"""Test bbs2ch.columns module."""
+from bbs2ch import browser
+from bbs2ch import columns
+
+
+def _response(num, second, poster_id):
+    return browser.Response(
+        num, u'', u'',
+        u'1970/01/01(木) 09:00:%02d.00 ID:%s' % (second, poster_id), u'')
+
+
+def test_thread_columns():
+    """Count responses per poster id and time window."""
+    thread_columns = columns.ThreadColumns()
+    for num, (second, poster_id) in enumerate(
+            [(0, u'a'), (1, u'b'), (5, u'a'), (12, u'a')], start=1):
+        thread_columns.add(_response(num, second, poster_id))
+    assert {u'a': 3, u'b': 1} == thread_columns.id_counts()
+    assert [1, 3, 4] == thread_columns.by_id(u'a')
+    assert [2, 3] == list(
+        thread_columns.nums[thread_columns.time_range(1.0, 12.0)])
+    assert (0.0, [2, 1, 1]) == (
+        thread_columns.rate(5.0)[0], list(thread_columns.rate(5.0)[1]))
+
+
+def test_board_columns():
+    """Compute velocity and acceleration between updates."""
+    board = columns.BoardColumns()
+    board.update([(u'0', u'a', 10), (u'43200', u'b', 1)], now=86400.0)
+    assert [10.0, 2.0] == list(board.velocity())
+    assert [1, 2] == list(board.ranks())
+    assert board.recent[0] != board.recent[0]  # NaN
+    board.update([(u'0', u'a', 20), (u'86400', u'c', 1)], now=172800.0)
+    assert 10.0 == board.recent[0]
+    assert board.accelerations[0] != board.accelerations[0]
+    assert board.recent[1] != board.recent[1]
+    board.update([(u'0', u'a', 40)], now=259200.0)
+    assert (20.0, 10.0) == (board.recent[0], board.accelerations[0])
+    other = columns.BoardColumns()
+    other.update([(u'200000', u'd', 100)], now=259200.0)
+    assert [u'200000', u'0'] == [
+        i[2] for i in columns.top_threads({u'x': board, u'y': other}, 2)]
+    assert [(20.0, u'x', u'0')] == columns.top_threads(
+        {u'x': board, u'y': other}, 5, 'recent')
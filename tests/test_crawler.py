@@ -0,0 +1,69 @@
+"""Test bbs2ch.crawler module."""
+from bbs2ch import crawler
+from bbs2ch import server
+
+
+def test_token_bucket():
+    """Return wait seconds if no token is left."""
+    bucket = crawler.TokenBucket(1.0, capacity=2.0)
+    assert 0.0 == bucket.take()
+    assert 0.0 == bucket.take()
+    assert 0.0 < bucket.take() <= 1.0
+
+
+class _Thread(crawler.browser.Thread):
+
+    """Thread fails at first fetch."""
+
+    def __init__(self, board_url, dat):
+        crawler.browser.Thread.__init__(self, board_url, dat)
+        self.count = 0
+
+    def __iter__(self):
+        self.count = self.count + 1
+        if self.count == 1:
+            raise crawler.socket.error('error')
+        yield crawler.browser.Response(1, u'', u'', u'', u'')
+
+
+def test_crawler_retry():
+    """Retry failed request and put new responses to results."""
+    crawl = crawler.Crawler(workers=2, rate=100.0, backoff=0.01)
+    threads = [_Thread(u'http://a.net/hoge/', u'1'),
+               _Thread(u'http://b.net/hoge/', u'2')]
+    for thread in threads:
+        crawl.add(thread)
+    crawl.start()
+    assert crawl.join(5.0)
+    crawl.stop()
+    results = sorted((crawl.results.get_nowait() for i in threads),
+                     key=lambda result: result[0].dat)
+    assert [t.dat for t in threads] == [t.dat for t, r in results]
+    assert [2, 2] == [t.count for t in threads]
+    assert crawl.failed.empty()
+
+
+def test_crawler_status():
+    """Retry 5xx status and fail after retries."""
+    bbs = server.Server(categories=1, boards=2, threads=3, responses=5,
+                        failure_rate=0.5)
+    bbs.start()
+    try:
+        crawl = crawler.Crawler(workers=2, rate=1000.0, burst=10.0,
+                                retries=10, backoff=0.001)
+        crawl.add(crawler.browser.Menu(bbs.url))
+        crawl.start()
+        assert crawl.join(10.0)
+        assert 503 in bbs.statuses
+        assert crawl.failed.empty()
+        assert 6 == crawl.results.qsize()
+        bbs.failure_rate = 1.0
+        crawl.retries = 1
+        menu = crawler.browser.Menu(bbs.url)
+        crawl.add(menu)
+        assert crawl.join(10.0)
+        crawl.stop()
+        item, err = crawl.failed.get_nowait()
+        assert (menu, 503) == (item, err.status)
+    finally:
+        bbs.stop()
@@ -37,3 +37,54 @@ def test_thread_dat():
             u'hoge<br>fuga ') == ret[0]
     assert (u'名無し', u'sage', u'2015/02/23(月) 00:00:00.00 ID:FFFFFFFF',
             u'テスト') == ret[1]
+
+
+def test_iter_lines():
+    """Split data chunks to lines."""
+    chunks = ['ab', 'c\nd', 'e\n\nf', 'g']
+    assert ['abc', 'de', '', 'fg'] == list(decode.iter_lines(chunks))
+
+
+def test_response_time():
+    """Decode JST date_id to unix time."""
+    assert 0.0 == decode.response_time(
+        u'1970/01/01(木) 09:00:00.00 ID:ZZZZZZZZ')
+
+
+def test_anchors():
+    """Decode anchors, ranges and lists."""
+    assert [1, 2, 10, 11, 12, 15] == decode.anchors(
+        u'&gt;&gt;1 ＞＞２ &gt;&gt;10-12,15 <a href="../test/read.cgi">')
+    assert [65535] == decode.anchors(
+        u'&gt;&gt;99999999999 &gt;&gt;65535-99999999999')
+
+
+def test_date_id():
+    """Decode date_id to time, poster id and be."""
+    assert (1388547296.78, u'abcd1234', u'12345678-2BP(1000)') == (
+        decode.date_id(u'2014/01/01(水) 12:34:56.78 ID:abcd1234 '
+                       u'BE:12345678-2BP(1000)'))
+
+
+def test_bytes_parsers():
+    """Return same tuples as unicode parsers."""
+    menu = u"""
+<B>カテゴリ1</B><BR>
+<A HREF=http://test2ch.net/hoge/>ほげ</A><br>
+<A HREF=http://test2ch.net/fuga/>ふが</A><br>
+<BR><BR><B>カテゴリ2</B><BR>
+<A HREF=http://test2ch.net/foo/>foo</A><br>"""
+    subject = u"""
+100.dat<>スレッド1 (2)
+200.dat<>スレッド (2) です (1000)"""
+    dat = u"""
+名無し<><>1970/01/01(木) 00:00:00.00 ID:ZZZZZZZZ<>hoge<br>fuga <>スレッド1
+名無し<>sage<>2015/02/23(月) 00:00:00.00 ID:FFFFFFFF<>テスト<>
+<><><>不明
+名無し<>sage<>2015/02/23(月) 00:00:00.00 ID:FFFFFFFF<>削除<>x<>"""
+    assert (list(decode.menu(menu)) ==
+            list(decode.menu_bytes(menu.encode('ms932'))))
+    assert (list(decode.board_subject(subject)) ==
+            list(decode.board_subject_bytes(subject.encode('ms932'))))
+    assert (list(decode.thread_dat(dat)) ==
+            list(decode.thread_dat_bytes(dat.encode('ms932'))))
@@ -0,0 +1,84 @@
+# coding: utf8
+"""Test bbs2ch.duplicate module."""
+from bbs2ch import browser
+from bbs2ch import duplicate
+
+SPAM = u'今なら無料で高収入！詳しくはこちらのサイトを見てね、登録は簡単です'
+
+
+def _thread(dat):
+    return browser.Thread(u'http://test2ch.net/hoge/', dat, u'title')
+
+
+def _response(num, message):
+    return browser.Response(num, u'', u'', u'', message)
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _signature(message):
+    return duplicate.signature(duplicate.shingles(message), 64)
+
+
+def test_signature():
+    """Estimate similarity of normalized messages."""
+    assert 1.0 == duplicate.similarity(
+        _signature(SPAM), _signature(u' <br> ' + SPAM.replace(u'！', u'!')))
+    near = SPAM.replace(u'無料', u'タダ') + u'ｗ'
+    assert 0.6 <= duplicate.similarity(_signature(SPAM), _signature(near))
+    assert 0.2 > duplicate.similarity(
+        _signature(SPAM), _signature(u'全然関係ない普通の書き込みですよね'))
+    assert 64 == len(_signature(u'短い書き込み'))
+
+
+def test_duplicate_index():
+    """Find near duplicates across threads and flag bursts."""
+    clock = _Clock()
+    index = duplicate.DuplicateIndex(burst_count=3, burst_window=60,
+                                     clock=clock)
+    url = u'http://test2ch.net/hoge/'
+    assert [] == index.add(_thread(u'1'), [
+        _response(1, u'全然関係ない普通の書き込みですよね'),
+        _response(2, SPAM),
+        _response(3, u'短い')])
+    assert 2 == len(index)
+    assert (url, u'1', 3) not in index
+    clock.now = clock.now + 120
+    assert [] == index.add(_thread(u'2'), [_response(1, SPAM + u'ｗｗｗ')])
+    assert [(url, u'2', 1)] == [
+        key for score, key in index.duplicates((url, u'1', 2))]
+    assert [] == index.duplicates((url, u'1', 1))
+    assert [(url, u'1', 2), (url, u'2', 1)] == sorted(
+        key for score, key in index.similar(SPAM + u'<br>'))
+    # the first spam is out of burst window
+    assert [] == index.add(_thread(u'3'), [_response(5, SPAM)])
+    assert [(url, u'4', 1)] == index.add(_thread(u'4'), [_response(1, SPAM)])
+    assert set([(url, u'2', 1), (url, u'3', 5), (url, u'4', 1)]) == (
+        index.bursts)
+    assert [] == index.add(_thread(u'4'), [_response(1, SPAM)])
+
+
+def test_duplicate_index_evict():
+    """Evict the oldest signatures over capacity."""
+    index = duplicate.DuplicateIndex(capacity=2, burst_count=2)
+    url = u'http://test2ch.net/hoge/'
+    index.add(_thread(u'1'), [_response(1, SPAM), _response(2, SPAM)])
+    index.add(_thread(u'2'), [_response(1, SPAM)])
+    assert 2 == len(index)
+    assert (url, u'1', 1) not in index
+    assert set([(url, u'1', 2), (url, u'2', 1)]) == index.bursts
+    assert [(1.0, (url, u'2', 1))] == index.duplicates((url, u'1', 2))
+    index.add(_thread(u'3'), [_response(1, u'全然関係ない普通の書き込みですよね'),
+                              _response(2, u'こっちも全く別の話題の書き込み')])
+    assert [] == index.duplicates((url, u'3', 1))
+    assert set() == index.bursts
+    assert [] == index.similar(SPAM)
+    assert all(index._buckets)
+    assert 2 == len(index._order)
@@ -0,0 +1,16 @@
+"""Test bbs2ch.graph module."""
+from bbs2ch import graph
+
+
+def test_reply_graph():
+    """Return anchors and replies of responses."""
+    replies = graph.ReplyGraph()
+    replies.add(1, [])
+    replies.add(2, [1])
+    replies.add(3, [1, 2, 5])
+    replies.add(3, [2])
+    assert [2, 3] == replies.replies(1)
+    assert 1 == replies.reply_count(2)
+    assert 0 == replies.reply_count(5)
+    assert [1, 2, 5] == replies.anchors(3)
+    assert [(2, 1), (1, 2)] == replies.popular()
@@ -40,3 +40,364 @@ def test_encode_request_post():
             'key=value&key2=value2\r\n'
             ==
             http.encode_request(u'POST', u'/', header, body))
+
+
+def _serve(responses):
+    """Start keep-alive server returns responses in order.
+
+    None after a response closes the connection.
+
+    :rtype: listening port, accepted connection count list
+    """
+    import socket
+    import threading
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)
+    accepted = []
+
+    def handle(connection):
+        while responses:
+            request = ''
+            while '\r\n\r\n' not in request:
+                data = connection.recv(2048)
+                if not data:
+                    return
+                request = request + data
+            connection.sendall(responses.pop(0))
+            if responses and responses[0] is None:
+                responses.pop(0)
+                break
+        connection.close()
+
+    def accept():
+        while True:
+            connection, address = server.accept()
+            accepted.append(address)
+            handle(connection)
+
+    thread = threading.Thread(target=accept)
+    thread.daemon = True
+    thread.start()
+    return server.getsockname()[1], accepted
+
+
+def test_fetch_pool_reuse():
+    """Reuse pooled connection if response is keep-alive."""
+    response = ('HTTP/1.1 200 OK\r\n'
+                'Content-Length: 4\r\n'
+                '\r\n'
+                'test')
+    port, accepted = _serve([response, response])
+    pool = http.ConnectionPool()
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    assert response == http.fetch('127.0.0.1', request, port, pool=pool)
+    assert response == http.fetch('127.0.0.1', request, port, pool=pool)
+    assert 1 == len(accepted)
+    pool.close()
+
+
+def test_fetch_pool_close():
+    """Do not reuse connection if response has Connection: close."""
+    response = ('HTTP/1.1 304 Not Modified\r\n'
+                'Connection: close\r\n'
+                '\r\n')
+    port, accepted = _serve([response])
+    pool = http.ConnectionPool()
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    assert response == http.fetch('127.0.0.1', request, port, pool=pool)
+    assert not pool._idle.get(('127.0.0.1', port))
+
+
+def test_pool_alive_high_fileno():
+    """Check idle connection over FD_SETSIZE."""
+    import os
+    import socket
+    a, b = socket.socketpair()
+    os.dup2(a.fileno(), 1100)
+
+    class High(object):
+        def fileno(self):
+            return 1100
+    try:
+        assert http._alive(High())
+        b.sendall('x')
+        assert not http._alive(High())
+    finally:
+        os.close(1100)
+        a.close()
+        b.close()
+
+
+def test_pool_wait_timeout():
+    """Raise socket.timeout if all connections are in use."""
+    import socket
+    import pytest
+    port, accepted = _serve(['unused'])
+    pool = http.ConnectionPool(maxsize=1, wait_timeout=0.05)
+    connection = pool.get('127.0.0.1', port)
+    with pytest.raises(socket.timeout):
+        pool.get('127.0.0.1', port)
+    pool.release(connection)
+    assert connection is pool.get('127.0.0.1', port)
+
+
+class _Broken(object):
+
+    """Socket like object fails to send or returns malformed response."""
+
+    def __init__(self, send=True):
+        self.send = send
+        self.closed = False
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, request):
+        if not self.send:
+            import errno
+            import socket
+            raise socket.error(errno.EPIPE, 'Broken pipe')
+
+    def recv_into(self, view, size):
+        data = 'garbage\r\n\r\n'
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.closed = True
+
+
+def test_open_response_release(monkeypatch):
+    """Release connection if sending or reading header fails."""
+    import socket
+    import pytest
+    connections = []
+
+    def connect(host, port, timeout):
+        connections.append(_Broken(send=len(connections) % 2 == 1))
+        return connections[-1]
+    monkeypatch.setattr(http, '_connect', connect)
+    pool = http.ConnectionPool(maxsize=1, wait_timeout=0.01)
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    for i in range(2):
+        with pytest.raises(socket.error):
+            http.open_response('127.0.0.1', request, pool=pool)
+        with pytest.raises(ValueError):
+            http.open_response('127.0.0.1', request, pool=pool)
+    assert all(i.closed for i in connections)
+    assert 0 == pool._count[('127.0.0.1', 80)]
+
+
+def test_send_retry_reused(monkeypatch):
+    """Send again with new connection if reused connection is broken."""
+    connections = []
+
+    def connect(host, port, timeout):
+        connections.append(_Broken())
+        return connections[-1]
+    monkeypatch.setattr(http, '_connect', connect)
+    monkeypatch.setattr(http, '_alive', lambda connection: True)
+    pool = http.ConnectionPool(maxsize=1, wait_timeout=0.01)
+    pool.release(pool.get('127.0.0.1'))
+    connections[0].send = False
+    connection = http.send('127.0.0.1', 'GET', pool=pool)
+    assert [False, True] == [i is connection for i in connections]
+    assert connections[0].closed
+
+
+def test_pipeline_fallback():
+    """Send rest requests again if server closes connection."""
+    closing = ('HTTP/1.1 200 OK\r\n'
+               'Connection: close\r\n'
+               'Content-Length: 1\r\n'
+               '\r\n'
+               '1')
+    response = ('HTTP/1.1 200 OK\r\n'
+                'Content-Length: 1\r\n'
+                '\r\n'
+                '2')
+    port, accepted = _serve([closing, response])
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    assert ['1', '2'] == [i.read_body() for i in http.pipeline(
+        '127.0.0.1', [request, request], port)]
+    assert 2 == len(accepted)
+
+
+def test_pipeline_truncated():
+    """Do not send request again if body is cut short."""
+    truncated = ('HTTP/1.1 200 OK\r\n'
+                 'Content-Length: 5\r\n'
+                 '\r\n'
+                 'abc')
+    response = ('HTTP/1.1 200 OK\r\n'
+                'Content-Length: 1\r\n'
+                '\r\n'
+                '2')
+    port, accepted = _serve([truncated, None, response])
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    assert [('abc', False), ('2', True)] == [
+        (i.read_body(), i.complete)
+        for i in http.pipeline('127.0.0.1', [request, request], port)]
+    assert 2 == len(accepted)
+
+
+class _Connection(object):
+
+    """Socket like object returns data in small pieces."""
+
+    def __init__(self, data, size=3):
+        self.data = data
+        self.size = size
+
+    def recv_into(self, view, size):
+        data = self.data[:min(size, self.size)]
+        self.data = self.data[len(data):]
+        view[:len(data)] = data
+        return len(data)
+
+
+def test_response_reader_content_length():
+    """Read Content-Length body without waiting connection close."""
+    connection = _Connection('HTTP/1.1 200 OK\r\n'
+                             'Content-Length: 10\r\n'
+                             '\r\n'
+                             '0123456789'
+                             'HTTP/1.1 200 OK\r\n')
+    reader = http.ResponseReader(connection, buffersize=4)
+    assert ('HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n0123456789' ==
+            reader.read())
+    assert ('HTTP/1.1', 200, 'OK') == reader.status
+    assert reader.keep_alive
+
+
+def test_response_reader_chunked():
+    """Decode chunked body."""
+    connection = _Connection('HTTP/1.1 200 OK\r\n'
+                             'Transfer-Encoding: chunked\r\n'
+                             '\r\n'
+                             '4\r\nWiki\r\n'
+                             '5;ext=1\r\npedia\r\n'
+                             '0\r\n'
+                             '\r\n')
+    reader = http.ResponseReader(connection, buffersize=5)
+    assert 'Wikipedia' == reader.read_body()
+    assert reader.complete
+    assert reader.keep_alive
+
+
+def test_response_reader_close():
+    """Read body until connection is closed if no length is given."""
+    connection = _Connection('HTTP/1.0 200 OK\r\n'
+                             '\r\n'
+                             'body')
+    reader = http.ResponseReader(connection)
+    assert 'body' == reader.read_body()
+    assert not reader.keep_alive
+
+
+def test_response_reader_iter_content_gzip():
+    """Decode gzip body while recieving."""
+    import zlib
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    body = compressor.compress('line1\nline2\n' * 100) + compressor.flush()
+    connection = _Connection('HTTP/1.1 200 OK\r\n'
+                             'Content-Encoding: gzip\r\n'
+                             'Content-Length: %d\r\n'
+                             '\r\n%s' % (len(body), body), size=16)
+    reader = http.ResponseReader(connection, buffersize=16)
+    assert 'line1\nline2\n' * 100 == ''.join(reader.iter_content())
+    assert reader.complete
+
+
+def test_response_parser_chunked():
+    """Parse chunked response fed byte by byte."""
+    response = ('HTTP/1.1 200 OK\r\n'
+                'Transfer-Encoding: chunked\r\n'
+                '\r\n'
+                '4\r\nWiki\r\n'
+                '5\r\npedia\r\n'
+                '0\r\n'
+                '\r\n')
+    parser = http.ResponseParser()
+    for index, char in enumerate(response):
+        assert (index == len(response) - 1) == parser.feed(char)
+    assert 'Wikipedia' == ''.join(parser.iter_content())
+
+
+def test_event_loop():
+    """Run requests on non-blocking sockets."""
+    response = ('HTTP/1.1 200 OK\r\n'
+                'Content-Length: 4\r\n'
+                '\r\n'
+                'test')
+    port, accepted = _serve([response, response])
+    request = http.encode_request('GET', u'/', [(u'Host', u'localhost')])
+    loop = http.EventLoop(timeout=5.0)
+    results = []
+    for i in range(2):
+        loop.request('127.0.0.1', request,
+                     lambda parser, error: results.append(
+                         (parser.read(), error)),
+                     port=port)
+    loop.run()
+    assert [(response, None), (response, None)] == results
+
+
+def test_host_port():
+    """Split port from hostname."""
+    assert ('hoge.com', 80) == http.host_port('hoge.com')
+    assert ('127.0.0.1', 8080) == http.host_port('127.0.0.1:8080', 80)
+
+
+def test_resolver_cache():
+    """Cache addresses and errors until ttl, use pinned addresses."""
+    import socket
+    now = [0.0]
+    lookups = []
+    resolver = http.Resolver(ttl=10.0, negative_ttl=1.0,
+                             clock=lambda: now[0])
+
+    def lookup(host):
+        lookups.append(host)
+        if host == 'bad':
+            raise socket.gaierror(-2, 'Name or service not known')
+        return ['10.0.0.1', '10.0.0.2']
+    resolver._lookup = lookup
+    assert [('10.0.0.1', 80), ('10.0.0.2', 80)] == resolver.resolve('a')
+    assert ['10.0.0.1', '10.0.0.2'] == resolver.addresses('a')
+    for i in range(2):
+        try:
+            resolver.resolve('bad')
+        except socket.gaierror:
+            pass
+    assert ['a', 'bad'] == lookups
+    now[0] = 5.0
+    resolver.addresses('a')
+    try:
+        resolver.resolve('bad')
+    except socket.gaierror:
+        pass
+    assert ['a', 'bad', 'bad'] == lookups
+    now[0] = 20.0
+    resolver.pin('a', ['127.0.0.1'])
+    assert [('127.0.0.1', 8080)] == resolver.resolve('a', 8080)
+    resolver.unpin('a')
+    resolver.addresses('a')
+    assert ['a', 'bad', 'bad', 'a'] == lookups
+
+
+def test_connect_any():
+    """Connect first reachable address of many."""
+    import socket
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1', 0))
+    listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening.bind(('127.0.0.1', 0))
+    listening.listen(1)
+    addresses = [closed.getsockname(), listening.getsockname()]
+    closed.close()
+    connection = http._connect_any(addresses, 2.0, 0.1)
+    assert listening.getsockname() == connection.getpeername()
+    connection.close()
+    listening.close()
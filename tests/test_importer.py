@@ -0,0 +1,101 @@
+"""Test bbs2ch.importer module."""
+import gzip
+
+from bbs2ch import importer
+from bbs2ch import store
+from bbs2ch import synthetic
+
+
+def _archive(tmpdir):
+    tmpdir.join('kako', 'hoge', '100.dat').write(
+        synthetic.dat(3), mode='wb', ensure=True)
+    tmpdir.join('kako', 'hoge', '200.dat').write(
+        synthetic.dat(5, seed=1), mode='wb', ensure=True)
+    tmpdir.join('kako', 'fuga', 'README').write('x', ensure=True)
+    with gzip.open(str(tmpdir.join('kako', 'fuga', '300.dat.gz')),
+                   'wb') as f:
+        f.write(synthetic.dat(2))
+    return str(tmpdir.join('kako'))
+
+
+def test_import_directory(tmpdir):
+    """Write parsed dat files to store with worker processes."""
+    dat_store = store.DatStore(str(tmpdir.join('store')))
+    progress = []
+    status = importer.import_directory(
+        _archive(tmpdir), dat_store, host=u'test2ch.net', processes=2,
+        batch_size=2, callback=progress.append)
+    assert (3, 10, 0) == (status[u'done'], status[u'responses'],
+                          status[u'errors'])
+    assert [2, 3] == [i[u'done'] for i in progress]
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'200')
+    assert 5 == len(dat_file)
+    assert synthetic.dat(5, seed=1).split('\n')[4] == dat_file.line(5)
+    dat_file.close()
+    dat_file = dat_store.open(u'http://test2ch.net/fuga/', u'300')
+    assert 2 == len(dat_file)
+    dat_file.close()
+
+
+def test_import_resume(tmpdir):
+    """Skip paths recorded in journal."""
+    directory = _archive(tmpdir)
+    journal = str(tmpdir.join('journal'))
+    batches = []
+    paths = list(importer.find_dats(directory))
+    sink = importer.Importer(batches.append, processes=1, journal=journal,
+                             responses=True)
+    assert 2 == sink.run(paths[:2])[u'done']
+    status = sink.run(paths)
+    assert (1, 2) == (status[u'done'], status[u'skipped'])
+    assert [2, 1] == [len(i) for i in batches]
+    assert [(paths[2], 5)] == [
+        (i.path, len(i.responses)) for i in batches[1]]
+
+
+def test_import_broken(tmpdir):
+    """Count broken archive as error and import other files."""
+    directory = _archive(tmpdir)
+    path = str(tmpdir.join('kako', 'fuga', '400.dat.gz'))
+    with gzip.open(path, 'wb') as f:
+        f.write(synthetic.dat(20))
+    with open(path, 'r+b') as f:
+        f.seek(20)
+        f.write('\xff' * 10)  # zlib.error
+    batches = []
+    progress = []
+    status = importer.Importer(
+        batches.append, processes=2, callback=progress.append).run(
+            list(importer.find_dats(directory)))
+    assert (4, 3, 1) == (status[u'done'], sum(len(i) for i in batches),
+                         status[u'errors'])
+    parsed = importer.parse_dat(path)
+    assert (0, True) == (parsed.count, bool(parsed.error))
+    assert [(path, parsed.error)] == status[u'failed']
+    assert status[u'failed'] == progress[-1][u'failed']
+
+
+def test_board_name():
+    """Take board before kako directory of kako layout."""
+    assert 'hoge' == importer.board_name('/a/hoge/kako/1234/12345/1.dat.gz')
+    assert 'hoge' == importer.board_name('/a/hoge/kako/123/1.dat')
+    assert 'hoge' == importer.board_name('/a/kako/hoge/1.dat')
+    assert '1234' == importer.board_name('/a/1234/1.dat')
+
+
+def test_import_kako(tmpdir):
+    """Import one of x.dat and x.dat.gz to board of kako layout."""
+    directory = tmpdir.join('hoge', 'kako', '1234', '12345')
+    directory.join('1234567890.dat').write(
+        synthetic.dat(3), mode='wb', ensure=True)
+    with gzip.open(str(directory.join('1234567890.dat.gz')), 'wb') as f:
+        f.write(synthetic.dat(5))
+    dat_store = store.DatStore(str(tmpdir.join('store')))
+    status = importer.import_directory(
+        str(tmpdir.join('hoge')), dat_store, host=u'test2ch.net',
+        processes=2, chunksize=1)
+    assert (1, 1, 3) == (status[u'done'], status[u'duplicates'],
+                         status[u'responses'])
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'1234567890')
+    assert 3 == len(dat_file)
+    dat_file.close()
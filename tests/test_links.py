@@ -0,0 +1,64 @@
+# coding: utf8
+"""Test bbs2ch.links module."""
+from bbs2ch import browser
+from bbs2ch import links
+from bbs2ch import util
+
+
+def _response(num, message):
+    return browser.Response(num, u'', u'', u'', message)
+
+
+def test_urls():
+    """Fix h-less and be icon urls."""
+    assert ([u'http://a.com/x', u'https://B.jp',
+             u'http://img.2ch.net/ico/1.gif']
+            == util.extract_url(u'見て ttp://a.com/x<br>https://B.jp '
+                                u'sssp://img.2ch.net/ico/1.gif'))
+
+
+def test_thread_links():
+    """Return links with response numbers."""
+    responses = [_response(1, u'http://a.com/1 ttp://b.com:8080/'),
+                 _response(2, u'なし'),
+                 _response(4, u'<br>http://user@A.com/3?q')]
+    board_url = u'http://test2ch.net/hoge/'
+    assert [(board_url, u'100', 1, u'http://a.com/1', u'a.com'),
+            (board_url, u'100', 1, u'http://b.com:8080/', u'b.com:8080'),
+            (board_url, u'100', 4, u'http://user@A.com/3?q', u'a.com')] == (
+        links.thread_links(board_url, u'100', responses))
+
+
+def _thread(dat, board=u'hoge'):
+    return browser.Thread(u'http://test2ch.net/{}/'.format(board), dat)
+
+
+def test_link_index():
+    """Add links of new responses by host."""
+    index = links.LinkIndex()
+    responses = [_response(1, u'http://a.com/1'),
+                 _response(2, u'http://b.com/ http://a.com/1')]
+    assert 3 == len(index.add(_thread(u'100'), responses))
+    assert [] == index.add(_thread(u'100'), responses)
+    index.add(_thread(u'100'),
+              responses + [_response(3, u'http://a.com/2')])
+    index.add(_thread(u'200'), [_response(1, u'http://a.com/1')])
+    assert {u'a.com': 4, u'b.com': 1} == index.hosts()
+    assert [u'http://a.com/1', u'http://a.com/2'] == index.urls(u'a.com')
+    assert [(u'100', 3)] == [(i.dat, i.num) for i in index.links(u'a.com')
+                             if i.url == u'http://a.com/2']
+    index.remove(_thread(u'100'))
+    assert {u'a.com': 1} == index.hosts()
+
+
+def test_link_index_same_dat():
+    """Keep threads of the same dat on different boards apart."""
+    index = links.LinkIndex()
+    index.add(_thread(u'100'), [_response(1, u'http://a.com/1'),
+                                _response(2, u'http://a.com/2')])
+    assert 2 == len(index.add(_thread(u'100', u'fuga'), [
+        _response(1, u'http://a.com/3'), _response(2, u'http://b.com/')]))
+    assert [u'http://test2ch.net/hoge/', u'http://test2ch.net/fuga/'] == [
+        i.board_url for i in index.links(u'a.com') if i.num == 1]
+    index.remove(_thread(u'100'))
+    assert {u'a.com': 1, u'b.com': 1} == index.hosts()
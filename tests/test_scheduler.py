@@ -0,0 +1,64 @@
+# coding: utf8
+"""Test bbs2ch.scheduler module."""
+from bbs2ch import browser
+from bbs2ch import scheduler
+
+
+class _Thread(browser.Thread):
+
+    """Thread returns given responses."""
+
+    def __init__(self, dat, fetches):
+        browser.Thread.__init__(self, u'http://test2ch.net/hoge/', dat)
+        self.fetches = fetches
+
+    def __iter__(self):
+        responses = self.fetches.pop(0) if self.fetches else []
+        if isinstance(responses, Exception):
+            raise responses
+        self.fetched = self.fetched + len(responses)
+        return iter(responses)
+
+
+def _responses(*times):
+    return [browser.Response(
+        1, u'', u'', u'2015/01/01(木) 00:00:%02d.00 ID:X' % i, u'')
+        for i in times]
+
+
+def test_scheduler_velocity():
+    """Poll fast thread often and retire not modified thread."""
+    now = [0.0]
+    schedule = scheduler.Scheduler(
+        min_interval=1.0, max_interval=100.0, retire_not_modified=2,
+        clock=lambda: now[0])
+    fast = _Thread(u'1', [_responses(0, 1, 2, 3, 4)])
+    dead = _Thread(u'2', [])
+    schedule.add(fast)
+    schedule.add(dead)
+    assert [(fast, 5)] == [(t, len(r)) for t, r in schedule.poll()]
+    assert 1.0 == schedule.next_time()
+    now[0] = 1.0
+    assert [] == schedule.poll()
+    assert 5.0 == schedule.next_time()
+    now[0] = 100.0
+    schedule.poll()
+    assert dead in schedule.retired
+
+
+def test_scheduler_error():
+    """Poll failed thread again later and poll other threads."""
+    now = [0.0]
+    schedule = scheduler.Scheduler(
+        min_interval=1.0, max_interval=100.0, clock=lambda: now[0])
+    failing = _Thread(u'1', [scheduler.socket.error('error'),
+                             _responses(0, 1)])
+    thread = _Thread(u'2', [_responses(0)])
+    schedule.add(failing)
+    schedule.add(thread)
+    assert [thread] == [t for t, r in schedule.poll()]
+    assert [failing] == [t for t, err in schedule.errors]
+    assert 2 == len(schedule)
+    now[0] = 100.0
+    assert [(failing, 2)] == [(t, len(r)) for t, r in schedule.poll()]
+    assert [] == schedule.errors
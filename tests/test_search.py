@@ -0,0 +1,52 @@
+# coding: utf8
+"""Test bbs2ch.search module."""
+from bbs2ch import browser
+from bbs2ch import search
+
+
+def _thread(dat, title):
+    return browser.Thread(u'http://test2ch.net/hoge/', dat, title)
+
+
+def test_title_index_next_thread():
+    """Return newer threads with similar title."""
+    index = search.TitleIndex()
+    current = _thread(u'100', u'【雑談】ほげスレ Part１２')
+    threads = [current,
+               _thread(u'200', u'【雑談】ほげスレ Part13'),
+               _thread(u'50', u'【雑談】ほげスレ Part11'),
+               _thread(u'300', u'ふがスレ')]
+    for thread in threads:
+        index.add(thread)
+    assert [threads[1]] == [t for s, t in index.next_thread(current)]
+    index.remove(threads[1])
+    assert [] == index.next_thread(current)
+
+
+def test_title_index_search():
+    """Rank threads by shared n-grams."""
+    index = search.TitleIndex()
+    threads = [_thread(u'1', u'python総合'), _thread(u'2', u'Python入門')]
+    for thread in threads:
+        index.add(thread)
+    assert threads[::-1] == [t for s, t in index.search(u'PYTHON入門')]
+
+
+def test_text_index(tmpdir):
+    """Return responses having all query terms as phrases."""
+    index = search.TextIndex()
+    thread = _thread(u'100', u'')
+    messages = [u'今日は晴れ<br>明日は雨', u'明日は晴れ', u'&gt;&gt;1 雨']
+    for num, message in enumerate(messages, start=1):
+        index.add(thread, browser.Response(num, u'', u'', u'', message))
+    key = (u'http://test2ch.net/hoge/', u'100')
+    assert [key + (1,), key + (2,)] == index.search(u'晴れ')
+    assert [key + (1,)] == index.search(u'晴れ 雨')
+    assert [key + (3,)] == index.search(u'">>1"')
+    assert [key + (2,)] == index.search(u'明日は晴れ')
+    assert [key + (1,)] == index.search(u'"晴れ 明日"')
+    assert [key + (1,), key + (3,)] == index.search(u'雨')
+    assert not index.verify(u'明日は晴れ', messages[0])
+    index.save(str(tmpdir.join('index')))
+    loaded = search.TextIndex.load(str(tmpdir.join('index')))
+    assert [key + (1,)] == loaded.search(u'明日は雨')
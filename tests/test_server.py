@@ -0,0 +1,208 @@
+# coding: utf8
+"""Test bbs2ch.server module."""
+import socket
+
+import pytest
+
+from bbs2ch import browser
+from bbs2ch import http
+from bbs2ch import server
+
+
+class _Clock(object):
+
+    def __init__(self, now=1424649600.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _Cookie(object):
+
+    def get(self, host, path):
+        return None
+
+    def set(self, host, path, value):
+        pass
+
+
+@pytest.yield_fixture
+def local():
+    clock = _Clock()
+    bbs = server.Server(categories=2, boards=3, threads=5, responses=20,
+                        growth=1.0, clock=clock)
+    bbs.clock_ = clock
+    bbs.start()
+    yield bbs
+    bbs.stop()
+
+
+def test_browse(local):
+    """Serve menu, subject.txt and dat to browser classes."""
+    boards = list(browser.Menu(local.url))
+    assert 6 == len(boards)
+    threads = list(boards[0])
+    assert 5 == len(threads)
+    thread = threads[0]
+    responses = list(thread)
+    assert thread.total == len(responses) == thread.fetched
+    assert [] == list(thread)
+    assert 304 in local.statuses
+
+
+def test_growth(local):
+    """Return new responses with Range as threads grow."""
+    board = browser.Board(local.board_url(u'hoge'))
+    thread = list(board)[0]
+    total = len(list(thread))
+    local.clock_.now += 10
+    assert range(total + 1, total + 11) == [i.num for i in thread]
+    assert 206 in local.statuses
+    assert [thread.dat] == [i.dat for i in board.refresh().count_changed][:1]
+
+
+def test_keep_alive(local):
+    """Reuse a connection with ConnectionPool."""
+    pool = http.ConnectionPool()
+    board = browser.Board(local.board_url(u'hoge'), pool=pool)
+    for thread in board:
+        list(thread)
+    pool.close()
+    assert 1 == local.connections
+
+
+def test_failure(local):
+    """Inject failed requests."""
+    local.failure_rate = 1.0
+    board = browser.Board(local.board_url(u'hoge'))
+    assert [] == list(board)
+    assert 503 in local.statuses
+    local.failure_status = None
+    with pytest.raises(socket.error):
+        board.refresh()
+
+
+def test_write(local):
+    """Append written response to dat."""
+    board = browser.Board(local.board_url(u'hoge'))
+    thread = list(board)[0]
+    thread.cookie = _Cookie()
+    list(thread)
+    local.clock_.now += 1
+    thread.write(u'', u'sage', u'書き込みテスト')
+    assert u' 書き込みテスト ' == [i.message for i in thread][-1]
+
+
+def test_hooks(local, monkeypatch):
+    """Report timing events of each request stage."""
+    events = []
+    monkeypatch.setattr(http, 'hooks', [lambda *args: events.append(args)])
+    pool = http.ConnectionPool()
+    board = browser.Board(local.board_url(u'hoge'), pool=pool)
+    thread = list(board)[0]
+    list(thread)
+    list(thread)
+    pool.close()
+    names = [i[0] for i in events]
+    assert [u'connect', u'response', u'decompress', u'parse',
+            u'parse', u'response', u'parse', u'response'] == names
+    assert (u'127.0.0.1', False) == (events[1][1][u'host'],
+                                     events[1][1][u'reused'])
+    subject = events[1][1]
+    assert subject[u'body_bytes'] == events[2][1][u'body_bytes']
+    assert subject[u'wire_bytes'] > events[2][1][u'wire_bytes']
+    full, not_modified = events[5][1], events[7][1]
+    assert (200, u'full', True) == (full[u'status'], full[u'cache'],
+                                    full[u'reused'])
+    assert full[u'wire_bytes'] < full[u'body_bytes'] == thread.bytes
+    assert full[u'first_byte'] >= 0 and full[u'decompress'] >= 0
+    assert (304, u'not_modified') == (not_modified[u'status'],
+                                      not_modified[u'cache'])
+    assert (u'dat', thread.fetched) == (events[4][1][u'kind'],
+                                        events[4][1][u'items'])
+
+
+def test_async_thread_reset(local, tmpdir):
+    """Return only fetched responses if stored dat is replaced."""
+    from bbs2ch import store
+    dat_store = store.DatStore(str(tmpdir))
+    board_url = local.board_url(u'hoge')
+    dat = list(browser.Board(board_url))[0].dat
+    results = []
+
+    def fetch():
+        thread = browser.AsyncThread(board_url, dat, store=dat_store)
+        loop = http.EventLoop(timeout=5.0)
+        thread.fetch(loop, lambda thread, responses, error: results.append(
+            ([i.num for i in responses], error)))
+        loop.run()
+    fetch()
+    total = len(results[0][0])
+    dat_file = dat_store.open(board_url, dat)
+    dat_file.append('name<><>date<>replaced<>')
+    dat_file.close()
+    fetch()
+    assert 416 in local.statuses
+    assert (range(1, total + 1), None) == results[1]
+
+
+def test_thread_reset(local, tmpdir):
+    """Do not return stored responses if stored dat is replaced."""
+    from bbs2ch import store
+    dat_store = store.DatStore(str(tmpdir))
+    board_url = local.board_url(u'hoge')
+    dat = list(browser.Board(board_url))[0].dat
+    total = len(list(browser.Thread(board_url, dat, store=dat_store)))
+    dat_file = dat_store.open(board_url, dat)
+    dat_file.append('name<><>date<>replaced<>')
+    dat_file.close()
+    thread = browser.Thread(board_url, dat, store=dat_store)
+    assert range(1, total + 1) == [i.num for i in thread]
+    assert 416 in local.statuses
+    local.clock_.now += 2
+    thread = browser.Thread(board_url, dat, store=dat_store)
+    assert range(1, total + 3) == [i.num for i in thread]
+    local.failure_rate = 1.0
+    thread = browser.Thread(board_url, dat, store=dat_store)
+    assert [] == list(thread)
+    local.failure_rate = 0.0
+    assert range(1, total + 3) == [i.num for i in thread]
+
+
+def test_pipeline(local):
+    """Fetch threads with pipelined requests on one connection."""
+    pool = http.ConnectionPool()
+    board = browser.Board(local.board_url(u'hoge'), pool=pool)
+    threads = list(board)
+    connections = local.connections
+    results = list(browser.pipeline(threads, pool=pool))
+    assert threads == [thread for thread, responses in results]
+    assert ([i.total for i in threads] ==
+            [len(responses) for thread, responses in results])
+    local.clock_.now += 3
+    results = list(browser.pipeline(threads, pool=pool))
+    assert [[i.total + 1, i.total + 2, i.total + 3] for i in threads] == [
+        [i.num for i in responses] for thread, responses in results]
+    assert connections == local.connections
+    pool.close()
+
+
+def test_pipeline_replaced(local, tmpdir):
+    """Fetch replaced thread again after pipelined connection is free."""
+    from bbs2ch import store
+    dat_store = store.DatStore(str(tmpdir))
+    pool = http.ConnectionPool(maxsize=1, wait_timeout=0.5)
+    board = browser.Board(local.board_url(u'hoge'), pool=pool,
+                          store=dat_store)
+    threads = list(board)[:3]
+    list(browser.pipeline(threads, pool=pool))
+    dat_file = dat_store.open(threads[0].board_url, threads[0].dat)
+    dat_file.append('name<><>date<>replaced<>')
+    dat_file.close()
+    results = list(browser.pipeline(threads, pool=pool))
+    assert 416 in local.statuses
+    assert threads == [thread for thread, responses in results]
+    assert [range(1, threads[0].total + 1), [], []] == [
+        [i.num for i in responses] for thread, responses in results]
+    pool.close()
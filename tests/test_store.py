@@ -0,0 +1,50 @@
+"""Test bbs2ch.store module."""
+from bbs2ch import store
+
+
+def test_dat_file(tmpdir):
+    """Read appended lines by line number."""
+    dat_store = store.DatStore(str(tmpdir))
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    dat_file.append('a<>b')
+    dat_file.append('cc')
+    dat_file.close()
+    assert tmpdir.join('test2ch.net', 'hoge', '100.dat').read() == (
+        'a<>b\ncc\n')
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    assert 2 == len(dat_file)
+    assert 8 == dat_file.size
+    assert 'cc' == dat_file.line(2)
+    dat_file.append('ddd')
+    assert ['a<>b', 'cc', 'ddd'] == list(dat_file.iter_lines())
+    dat_file.close()
+
+
+def test_dat_file_repair(tmpdir):
+    """Drop partially written line."""
+    dat_store = store.DatStore(str(tmpdir))
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    dat_file.append('a')
+    dat_file.close()
+    tmpdir.join('test2ch.net', 'hoge', '100.dat').write('a\nbb', mode='a')
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    assert (2, 4) == (len(dat_file), dat_file.size)
+    assert 'a' == dat_file.line(2)
+    dat_file.close()
+    assert 'a\na\n' == tmpdir.join('test2ch.net', 'hoge', '100.dat').read()
+
+
+def test_dat_file_lost_index(tmpdir):
+    """Rebuild index from dat."""
+    dat_store = store.DatStore(str(tmpdir))
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    dat_file.append('a')
+    dat_file.append('bb')
+    dat_file.close()
+    tmpdir.join('test2ch.net', 'hoge', '100.idx').remove()
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    assert ['a', 'bb'] == list(dat_file.iter_lines())
+    dat_file.close()
+    dat_file = dat_store.open(u'http://test2ch.net/hoge/', u'100')
+    assert 2 == len(dat_file)
+    dat_file.close()
@@ -0,0 +1,26 @@
+# coding: utf8
+"""Test bbs2ch.synthetic module."""
+from bbs2ch import decode
+from bbs2ch import http
+from bbs2ch import synthetic
+
+
+def test_parsable():
+    """Generate data parsed by decode module."""
+    assert 6 == len(list(decode.menu_bytes(synthetic.menu(3, 2))))
+    subject = list(decode.board_subject_bytes(synthetic.subject(10)))
+    assert 10 == len(subject)
+    assert subject[0][0] > subject[-1][0]
+    responses = list(decode.thread_dat_bytes(synthetic.dat(50)))
+    assert 50 == len(responses)
+    assert all(decode.response_time(i[2]) for i in responses)
+    assert synthetic.dat(50) == synthetic.dat(50)
+
+
+def test_response():
+    """Build http response decoded by http module."""
+    body = synthetic.dat(10)
+    status, header, decoded, length = http.decode_response(
+        synthetic.response(body, gzipped=True))
+    assert 200 == status[1]
+    assert body.decode('ms932') == decoded